@@ -3,6 +3,7 @@
 from flask import Flask, jsonify
 from models import storage
 from api.v1.views import app_views
+import io
 import os
 from flask_cors import CORS
 
@@ -26,6 +27,12 @@ def not_found(error):
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(io.UnsupportedOperation)
+def read_only(error):
+    """Handler for writes to a read-only storage."""
+    return jsonify({"error": "Read-only storage"}), 503
+
+
 if __name__ == "__main__":
     host = os.getenv('HBNB_API_HOST', '0.0.0.0')
     port = int(os.getenv('HBNB_API_PORT', 5002))
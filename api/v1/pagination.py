@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+"""Pagination helpers for the list views
+
+Pages are ordered by (created_at, id). A cursor is the opaque encoding
+of the (created_at, id) pair of the last object of a page; the next
+page starts right after it. Pages are streamed one object at a time,
+as a JSON array or, when the client accepts it, as NDJSON.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from flask import abort, current_app, request, Response
+from flask import stream_with_context
+from itertools import chain, islice
+import json
+from models import storage
+from models.base_model import time
+from urllib.parse import urlencode
+
+
+def page_args():
+    """Reads the requested page from the query string
+
+    Return:
+        (limit, after) where limit is the page size, or None for no limit,
+        and after the (created_at, id) pair the page starts after, or None
+    """
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(400, "Invalid limit")
+        if limit < 1:
+            abort(400, "Invalid limit")
+    cursor = request.args.get("cursor")
+    if cursor is None:
+        return limit, None
+    try:
+        created_at, id = json.loads(urlsafe_b64decode(cursor.encode()))
+        after = (datetime.strptime(created_at, time), id)
+    except (ValueError, TypeError):
+        abort(400, "Invalid cursor")
+    if not isinstance(id, str):
+        abort(400, "Invalid cursor")
+    return limit, after
+
+
+def encode_cursor(obj):
+    """Returns the cursor of the page starting right after obj"""
+    after = [obj.created_at.strftime(time), obj.id]
+    return urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+
+def paginate(objs, limit, to_dict=None):
+    """Builds the JSON response of one page
+
+    Args:
+        objs (iterable): the objects of the page, fetched with limit + 1
+            so that the extra one tells whether a next page exists
+        limit (int): the page size, None when not paginating
+        to_dict (function): serializes one object, obj.to_dict by default
+
+    Return:
+        The JSON list of the page, with a Link header to the next page
+    """
+    more = False
+    if limit is not None:
+        objs = list(objs)
+        more = len(objs) > limit
+        if more:
+            objs = objs[:limit]
+    response = stream(objs, to_dict)
+    if more:
+        args = request.args.to_dict()
+        args["cursor"] = encode_cursor(objs[-1])
+        response.headers["Link"] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(args))
+    return response
+
+
+def stream(objs, to_dict=None):
+    """Streams objs as a JSON array, or NDJSON if the client prefers it
+
+    Only one object is serialized at a time, so objs can be an iterator
+    over any number of rows. The first one is fetched before the
+    response is built, so that a query failing, which a lazy iterator
+    only runs then, is answered with an error status rather than a
+    truncated body.
+    """
+    objs = iter(objs)
+    objs = chain(list(islice(objs, 1)), objs)
+    ndjson = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+    def generate():
+        """yields the serialized objects one by one"""
+        dumps = current_app.json.dumps
+        if not ndjson:
+            yield "["
+        for i, obj in enumerate(objs):
+            data = dumps(to_dict(obj) if to_dict else obj.to_dict(),
+                         separators=(",", ":"))
+            if ndjson:
+                yield data + "\n"
+            else:
+                yield data if i == 0 else "," + data
+        if not ndjson:
+            yield "]\n"
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def list_response(cls, where=None):
+    """Builds the JSON response of the requested page of cls objects
+
+    Args:
+        cls (class): the class of the objects listed
+        where (dict): attribute values the objects must have
+
+    Return:
+        The JSON list of the page, with a Link header to the next page
+    """
+    limit, after = page_args()
+    objs = storage.page(cls, where, after=after,
+                        limit=limit + 1 if limit else None)
+    return paginate(objs, limit)
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Amenities module"""
+from api.v1.pagination import list_response
 from api.v1.views import app_views
 from flask import jsonify, abort, make_response, request
 from models import storage
@@ -11,12 +12,12 @@ def get_amenities():
     """
     Retrieves the list of all Amenity objects.
 
+    Pages through them with the limit and cursor query parameters.
+
     Returns:
         JSON: A list of all Amenity objects.
     """
-    amenities = [amenity.to_dict() for amenity in
-                 storage.all(Amenity).values()]
-    return jsonify(amenities)
+    return list_response(Amenity)
 
 
 @app_views.route('/amenities/<amenity_id>', strict_slashes=False)
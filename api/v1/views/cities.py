@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """City Module"""
+from api.v1.pagination import list_response
 from api.v1.views import app_views
 from flask import abort, jsonify, make_response, request
 from models import storage
@@ -11,6 +12,8 @@ from models.state import State
 def get_cities(state_id):
     """Retrieves the list of all City objects
 
+    Pages through them with the limit and cursor query parameters.
+
     Args:
         state_id (str): State object ID
 
@@ -20,8 +23,7 @@ def get_cities(state_id):
     states = storage.get(State, state_id)
     if not states:
         abort(404)
-    cities = [city.to_dict() for city in states.cities]
-    return jsonify(cities)
+    return list_response(City, {"state_id": state_id})
 
 
 @app_views.route('/cities/<city_id>', strict_slashes=False)
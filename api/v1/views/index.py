@@ -23,12 +23,13 @@ def status():
 @app_views.route('/stats')
 def get_stats():
     """ Retrieves the number of each objects by type """
+    counts = storage.counts()
     stats = {
-        "amenities": storage.count(Amenity),
-        "cities": storage.count(City),
-        "places": storage.count(Place),
-        "reviews": storage.count(Review),
-        "states": storage.count(State),
-        "users": storage.count(User)
+        "amenities": counts[Amenity.__name__],
+        "cities": counts[City.__name__],
+        "places": counts[Place.__name__],
+        "reviews": counts[Review.__name__],
+        "states": counts[State.__name__],
+        "users": counts[User.__name__]
     }
     return jsonify(stats)
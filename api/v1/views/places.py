@@ -1,13 +1,12 @@
 #!/usr/bin/python3
 """Place Module"""
+from api.v1.pagination import list_response, page_args, paginate
 from api.v1.views import app_views
 from flask import abort, jsonify, make_response, request
 from models import storage
 from models.city import City
 from models.place import Place
 from models.user import User
-from models.state import State
-from models.amenity import Amenity
 
 
 @app_views.route('/cities/<city_id>/places', methods=['GET'],
@@ -15,6 +14,8 @@ from models.amenity import Amenity
 def get_places(city_id):
     """Retrieves the list of all Place objects of a City
 
+    Pages through them with the limit and cursor query parameters.
+
     Args:
         city_id (str): City object ID
 
@@ -24,8 +25,7 @@ def get_places(city_id):
     city = storage.get(City, city_id)
     if not city:
         abort(404)
-    places = [place.to_dict() for place in city.places]
-    return jsonify(places)
+    return list_response(Place, {"city_id": city_id})
 
 
 @app_views.route('/places/<place_id>', methods=['GET'],
@@ -121,6 +121,8 @@ def update_place(place_id):
 def search_places():
     """Searches Place objects by filters
 
+    Pages through the results with the limit and cursor query parameters
+
     Returns:
         JSON: List of Place objects matching filters, or error 40
     """
@@ -129,42 +131,35 @@ def search_places():
     data = request.get_json()
     if not data:
         abort(400, 'Not a JSON')
+    limit, after = page_args()
+    places = storage.search_places(data.get('states'), data.get('cities'),
+                                   data.get('amenities'), after=after,
+                                   limit=limit + 1 if limit else None)
+    return paginate(places, limit, place_to_dict)
+
+
+@app_views.route('/places_search/facets', methods=['POST'],
+                 strict_slashes=False)
+def search_places_facets():
+    """Counts the places having each amenity among the search results
+
+    Takes the same filters as places_search
+
+    Returns:
+        JSON: Number of matching places by amenity id
+    """
+    if request.content_type != 'application/json':
+        abort(400, 'Not a JSON')
+    data = request.get_json()
+    if not data:
+        abort(400, 'Not a JSON')
+    places = storage.search_places(data.get('states'), data.get('cities'),
+                                   data.get('amenities'))
+    return jsonify(storage.amenity_facets(place.id for place in places))
+
 
-    states = data.get('states')
-    cities = data.get('cities')
-    amenities = data.get('amenities')
-    if not (states or cities or amenities):
-        places = storage.all(Place).values()
-        list_places = [place.to_dict() for place in places]
-        return jsonify(list_places)
-    list_places = []
-
-    if states:
-        states_obj = [storage.get(State, state_id) for state_id in states]
-        for state in states_obj:
-            if state:
-                for city in state.cities:
-                    if city:
-                        for place in city.places:
-                            list_places.append(place)
-    if cities:
-        city_obj = [storage.get(City, city_id) for city_id in cities]
-        for city in city_obj:
-            if city:
-                for place in city.places:
-                    if place not in list_places:
-                        list_places.append(place)
-    if amenities:
-        if not list_places:
-            all_places = storage.all(Place).values()
-            amenities_obj = [storage.get(Amenity, amenity_id)
-                             for amenity_id in amenities]
-            for place in all_places:
-                if all([am in place.amenities for am in amenities_obj]):
-                    list_places.append(place)
-    places = []
-    for plc_obj in list_places:
-        plc_dict = plc_obj.to_dict()
-        plc_dict.pop('amenities', None)
-        places.append(plc_dict)
-    return jsonify(places)
+def place_to_dict(place):
+    """Serializes a Place found by search_places, without its amenities"""
+    plc_dict = place.to_dict()
+    plc_dict.pop('amenities', None)
+    return plc_dict
@@ -2,7 +2,7 @@
 """Places Amenities Module"""
 from api.v1.views import app_views
 from flask import abort, jsonify, make_response
-from models import storage
+from models import storage, storage_t
 from models.place import Place
 from models.amenity import Amenity
 
@@ -18,7 +18,7 @@ def get_place_amenities(place_id):
     Return:
         JSON list of Amenity objects, error 404 otherwise
     """
-    place = storage.get(Place, place_id)
+    place = storage.get(Place, place_id, load={"amenities": "joined"})
     if not place:
         abort(404)
     amenities = [amenity.to_dict() for amenity in place.amenities]
@@ -37,16 +37,21 @@ def delete_place_amenity(place_id, amenity_id):
     Return:
         Empty dictionary with status code 200
     """
-    place = storage.get(Place, place_id)
+    place = storage.get(Place, place_id, load={"amenities": "joined"})
     if not place:
         abort(404)
     amenity = storage.get(Amenity, amenity_id)
     if not amenity:
         abort(404)
-    if amenity not in place.amenities:
+    # by id: a read-only storage builds new objects on every read
+    if amenity.id not in [linked.id for linked in place.amenities]:
         abort(404)
-    place.amenities.remove(amenity)
-    storage.save()
+    if storage_t == "db":
+        place.amenities.remove(amenity)
+    else:
+        place.amenity_ids = [linked for linked in place.amenity_ids
+                             if linked != amenity_id]
+    place.save()
     return make_response(jsonify({}), 200)
 
 
@@ -63,14 +68,17 @@ def link_place_amenity(place_id, amenity_id):
         Amenity object with status code 201 if not already linked,
         otherwise returns the Amenity with status code 200
     """
-    place = storage.get(Place, place_id)
+    place = storage.get(Place, place_id, load={"amenities": "joined"})
     if not place:
         abort(404)
     amenity = storage.get(Amenity, amenity_id)
     if not amenity:
         abort(404)
-    if amenity in place.amenities:
+    if amenity.id in [linked.id for linked in place.amenities]:
         return make_response(jsonify(amenity.to_dict()), 200)
-    place.amenities.append(amenity)
-    storage.save()
+    if storage_t == "db":
+        place.amenities.append(amenity)
+    else:
+        place.amenity_ids = place.amenity_ids + [amenity_id]
+    place.save()
     return make_response(jsonify(amenity.to_dict()), 201)
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """Places Reviews Module"""
+from api.v1.pagination import list_response
 from api.v1.views import app_views
 from flask import abort, jsonify, make_response, request
 from models import storage
@@ -13,6 +14,8 @@ from models.user import User
 def get_reviews(place_id):
     """Retrieves the list of all Review objects of a Place
 
+    Pages through them with the limit and cursor query parameters.
+
     Args:
         place_id (str): Place object ID
 
@@ -22,8 +25,7 @@ def get_reviews(place_id):
     place = storage.get(Place, place_id)
     if not place:
         abort(404)
-    reviews = [review.to_dict() for review in place.reviews]
-    return jsonify(reviews)
+    return list_response(Review, {"place_id": place_id})
 
 
 @app_views.route('/reviews/<review_id>', methods=['GET'],
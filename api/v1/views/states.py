@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """State module"""
+from api.v1.pagination import list_response
 from api.v1.views import app_views
 from flask import jsonify, request, abort, make_response
 from models import storage
@@ -11,11 +12,12 @@ def get_states():
     """
     Retrieves the list of all State objects.
 
+    Pages through them with the limit and cursor query parameters.
+
     Returns:
         JSON: A list of all State objects.
     """
-    states = [state.to_dict() for state in storage.all(State).values()]
-    return jsonify(states)
+    return list_response(State)
 
 
 @app_views.route('/states/<state_id>', methods=['GET'], strict_slashes=False)
@@ -103,5 +105,5 @@ def update_state(state_id):
     for key, value in data.items():
         if key not in ['id', 'created_at', 'updated_at']:
             setattr(state, key, value)
-    storage.save()
+    state.save()
     return make_response(jsonify(state.to_dict()), 200)
@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 """User module"""
+from api.v1.pagination import list_response
 from api.v1.views import app_views
 from flask import jsonify, abort, make_response, request
 from models import storage
@@ -11,11 +12,12 @@ def get_users():
     """
     Retrieves the list of all User objects.
 
+    Pages through them with the limit and cursor query parameters.
+
     Returns:
         JSON: A list of all User objects.
     """
-    users = [user.to_dict() for user in storage.all(User).values()]
-    return jsonify(users)
+    return list_response(User)
 
 
 @app_views.route('/users/<user_id>', strict_slashes=False)
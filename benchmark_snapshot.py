@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""
+Benchmarks loading and saving a FileStorage snapshot in the JSON and
+binary formats
+
+Usage: ./benchmark_snapshot.py [snapshot] [repeat]
+
+The snapshot, file.json by default, is loaded once, then saved and
+loaded back repeat times (5 by default) in each format. Loading builds
+the objects, as FileStorage.reload does. The best time of each is shown.
+"""
+
+from models.engine import snapshot
+from models.engine.file_storage import classes
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+
+def best(repeat, func):
+    """returns the shortest time func took out of repeat calls"""
+    times = []
+    for i in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def benchmark(path, repeat):
+    """prints the save and load times of the snapshot at path"""
+    with open(path, 'rb') as f:
+        read = snapshot.formats["binary" if snapshot.is_binary(f)
+                                else "json"][0]
+        objs = [classes[data["__class__"]](**data) for key, data in read(f)]
+    print("{}: {} objects, best of {}".format(path, len(objs), repeat))
+    print("{:8} {:>10} {:>10} {:>12}".format("format", "save (s)",
+                                             "load (s)", "size (bytes)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for format, (read, write) in snapshot.formats.items():
+            out = os.path.join(tmp, "snapshot." + format)
+
+            def save():
+                """writes every object"""
+                with open(out, 'w+b') as f:
+                    write(f, ((obj.__class__.__name__ + "." + obj.id,
+                               obj.to_dict()) for obj in objs))
+
+            def load():
+                """reads every record back into an object"""
+                with open(out, 'rb') as f:
+                    for key, data in read(f):
+                        classes[data["__class__"]](**data)
+            save_time = best(repeat, save)
+            load_time = best(repeat, load)
+            print("{:8} {:>10.4f} {:>10.4f} {:>12}".format(
+                format, save_time, load_time, os.path.getsize(out)))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "file.json"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    benchmark(path, repeat)
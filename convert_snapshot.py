@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+"""
+Converts a FileStorage snapshot between the JSON and binary formats
+
+Usage: ./convert_snapshot.py <source> <destination> [json | binary]
+
+The format of the source is detected; the destination is written in the
+given format, by default the other one.
+"""
+
+from models.engine import snapshot
+import os
+import sys
+
+
+def convert(source, destination, format=None):
+    """writes the records of the source snapshot to destination
+
+    Records are converted one at a time. The destination is written to a
+    temporary file first and only replaces destination once complete.
+
+    Return:
+        the number of records converted
+    """
+    count = 0
+    with open(source, 'rb') as src:
+        binary = snapshot.is_binary(src)
+        if format is None:
+            format = "json" if binary else "binary"
+        read = snapshot.formats["binary" if binary else "json"][0]
+        write = snapshot.formats[format][1]
+
+        def records():
+            """yields the records of the source, counting them"""
+            nonlocal count
+            for key, data in read(src):
+                count += 1
+                yield key, data
+        tmp_path = destination + ".tmp"
+        with open(tmp_path, 'w+b') as dst:
+            write(dst, records())
+    os.replace(tmp_path, destination)
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or \
+            (len(sys.argv) == 4 and sys.argv[3] not in snapshot.formats):
+        print("Usage: {} <source> <destination> [json | binary]"
+              .format(sys.argv[0]))
+        sys.exit(1)
+    format = sys.argv[3] if len(sys.argv) == 4 else None
+    count = convert(sys.argv[1], sys.argv[2], format)
+    print("{} records converted to {}".format(count, sys.argv[2]))
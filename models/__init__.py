@@ -8,9 +8,17 @@ from os import getenv
 
 storage_t = getenv("HBNB_TYPE_STORAGE")
 
-if storage_t == "db":
+if storage_t == "sqlite":
+    # the models are mapped to tables just as for MySQL
+    storage_t = "db"
+    from models.engine.sqlite_storage import SQLiteStorage
+    storage = SQLiteStorage()
+elif storage_t == "db":
     from models.engine.db_storage import DBStorage
     storage = DBStorage()
+elif storage_t == "mmap":
+    from models.engine.mapped_storage import MappedStorage
+    storage = MappedStorage()
 else:
     from models.engine.file_storage import FileStorage
     storage = FileStorage()
@@ -21,31 +21,54 @@ else:
 
 class BaseModel:
     """The BaseModel class from which future classes will be derived"""
+    # _dirty: boolean - set whenever an attribute is, and cleared by the
+    # storage once it serialized the instance; a slot, so not in __dict__
+    __slots__ = ("_dirty", "__dict__", "__weakref__")
     if models.storage_t == "db":
         id = Column(String(60), primary_key=True)
-        created_at = Column(DateTime, default=datetime.utcnow)
+        created_at = Column(DateTime, default=datetime.utcnow, index=True)
         updated_at = Column(DateTime, default=datetime.utcnow)
 
     def __init__(self, *args, **kwargs):
-        """Initialization of the base model"""
+        """Initialization of the base model
+
+        Attributes are set past the dirty hook of __setattr__, and the
+        instance is marked dirty once, at the end.
+        """
+        set_attr = object.__setattr__
         if kwargs:
             for key, value in kwargs.items():
                 if key != "__class__":
-                    setattr(self, key, value)
+                    set_attr(self, key, value)
             if kwargs.get("created_at", None) and type(self.created_at) is str:
-                self.created_at = datetime.strptime(kwargs["created_at"], time)
-            else:
-                self.created_at = datetime.utcnow()
+                set_attr(self, "created_at",
+                         datetime.strptime(kwargs["created_at"], time))
+            elif type(kwargs.get("created_at", None)) is not datetime:
+                set_attr(self, "created_at", datetime.utcnow())
             if kwargs.get("updated_at", None) and type(self.updated_at) is str:
-                self.updated_at = datetime.strptime(kwargs["updated_at"], time)
-            else:
-                self.updated_at = datetime.utcnow()
+                set_attr(self, "updated_at",
+                         datetime.strptime(kwargs["updated_at"], time))
+            elif type(kwargs.get("updated_at", None)) is not datetime:
+                set_attr(self, "updated_at", datetime.utcnow())
             if kwargs.get("id", None) is None:
-                self.id = str(uuid.uuid4())
+                set_attr(self, "id", str(uuid.uuid4()))
         else:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.utcnow()
-            self.updated_at = self.created_at
+            set_attr(self, "id", str(uuid.uuid4()))
+            set_attr(self, "created_at", datetime.utcnow())
+            set_attr(self, "updated_at", self.created_at)
+        set_attr(self, "_dirty", True)
+
+    def __setattr__(self, name, value):
+        """sets an attribute and marks the instance dirty, if it is not
+        already, then has a storage keeping reverse indexes follow it"""
+        object.__setattr__(self, name, value)
+        if name == "_dirty":
+            return
+        if not getattr(self, "_dirty", False):
+            object.__setattr__(self, "_dirty", True)
+        reindex = getattr(getattr(models, "storage", None), "reindex", None)
+        if reindex is not None:
+            reindex(self, name)
 
     def __str__(self):
         """String representation of the BaseModel class"""
@@ -55,6 +78,7 @@ class BaseModel:
     def save(self):
         """updates the attribute 'updated_at' with the current datetime"""
         self.updated_at = datetime.utcnow()
+        self._dirty = True
         models.storage.new(self)
         models.storage.save()
 
@@ -68,6 +92,11 @@ class BaseModel:
         new_dict["__class__"] = self.__class__.__name__
         if "_sa_instance_state" in new_dict:
             del new_dict["_sa_instance_state"]
+        mapper = getattr(type(self), "__mapper__", None)
+        if mapper is not None:
+            # related objects loaded along are not columns of the object
+            for name in mapper.relationships.keys():
+                new_dict.pop(name, None)
         if models.storage_t == 'db' and 'password' in new_dict:
             del new_dict['password']
         return new_dict
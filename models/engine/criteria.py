@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+"""
+Contains the functions reading the conditions and the ordering of a
+storage query, and applying them to objects in memory
+
+A query selects the objects whose attributes meet every condition of
+where, a dictionary whose values are either the value an attribute must
+equal, or an (operator, value) pair with an operator of operators. An
+attribute that is None meets no condition but equality to None, as a
+NULL column in SQL. order_by is an attribute name, or a list of them,
+each prefixed by "-" for a descending order; objects are ordered by
+(created_at, id) by default, and by id after the given attributes.
+"""
+
+import operator
+
+# dictionary - the comparison of each operator of a condition
+operators = {"==": operator.eq, "!=": operator.ne,
+             "<": operator.lt, "<=": operator.le,
+             ">": operator.gt, ">=": operator.ge,
+             "in": lambda value, values: value in values}
+default_order = [("created_at", False), ("id", False)]
+
+
+def conditions(where):
+    """returns the (attribute, operator, value) conditions of where
+
+    Raises:
+        ValueError: an operator is not one of operators
+    """
+    found = []
+    for attr, value in (where or {}).items():
+        op = "=="
+        if isinstance(value, tuple):
+            op, value = value
+        if op not in operators:
+            raise ValueError("unknown operator {}".format(op))
+        if op == "in":
+            value = list(value)
+        found.append((attr, op, value))
+    return found
+
+
+def ordering(order_by):
+    """returns the (attribute, descending) pairs to order by, ending with
+    the id"""
+    if not order_by:
+        return list(default_order)
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    order = [(name.lstrip("-"), name.startswith("-")) for name in order_by]
+    if "id" not in [attr for attr, descending in order]:
+        order.append(("id", False))
+    return order
+
+
+def matches(obj, conditions):
+    """tells whether obj meets every condition of conditions"""
+    for attr, op, value in conditions:
+        found = getattr(obj, attr, None)
+        if found is None:
+            if op != "==" or value is not None:
+                return False
+            continue
+        try:
+            if not operators[op](found, value):
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def sort(objs, order):
+    """returns the list of objs sorted by the pairs of order, None first
+    as in SQL"""
+    objs = list(objs)
+    for attr, descending in reversed(order):
+        objs.sort(key=lambda obj: (getattr(obj, attr, None) is not None,
+                                   getattr(obj, attr, None)),
+                  reverse=descending)
+    return objs
+
+
+def window(objs, limit=None, offset=None):
+    """returns the limit objects of the list objs after the first offset"""
+    start = offset or 0
+    return objs[start:None if limit is None else start + limit]
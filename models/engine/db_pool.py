@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""
+Contains the MeteredQueuePool class
+"""
+
+from collections import deque
+import threading
+from time import monotonic
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool recording how long every checkout took
+
+    A checkout covers waiting for a free connection, opening a new one
+    within the overflow, and the pre-ping. The statistics are kept across
+    the pools an engine recreates on dispose().
+    """
+    # int - number of most recent checkout times the percentiles are of
+    __window = 1024
+
+    def __init__(self, creator, **kw):
+        """Instantiate a MeteredQueuePool, with the QueuePool arguments"""
+        super().__init__(creator, **kw)
+        self.__lock = threading.Lock()
+        self.__waits = deque(maxlen=self.__window)
+        # list - checkouts, timeouts, total and longest checkout time
+        self.__totals = [0, 0, 0.0, 0.0]
+
+    def connect(self):
+        """checks out a connection, timing it"""
+        start = monotonic()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            with self.__lock:
+                self.__totals[1] += 1
+            raise
+        wait = monotonic() - start
+        with self.__lock:
+            self.__waits.append(wait)
+            self.__totals[0] += 1
+            self.__totals[2] += wait
+            self.__totals[3] = max(self.__totals[3], wait)
+        return connection
+
+    def recreate(self):
+        """returns a new pool of the same settings sharing the statistics"""
+        pool = super().recreate()
+        pool.__lock = self.__lock
+        pool.__waits = self.__waits
+        pool.__totals = self.__totals
+        return pool
+
+    def warm(self, count=None):
+        """opens count connections at once, the pool size by default, and
+        leaves them in the pool; the statistics do not count them"""
+        if count is None:
+            count = self.size()
+        connections = []
+        try:
+            for i in range(count):
+                connections.append(super().connect())
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def stats(self):
+        """returns the state of the pool and the checkout statistics
+
+        Return:
+            dictionary of the pool size, the connections checked in and
+            out, the overflow, and the number of checkouts and timeouts
+            with the mean, median, 95th percentile and longest checkout
+            times in milliseconds
+        """
+        with self.__lock:
+            waits = sorted(self.__waits)
+            checkouts, timeouts, total, longest = self.__totals
+
+        def percentile(p):
+            """returns the p percentile of waits in milliseconds"""
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000
+
+        return {"size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "checkouts": checkouts,
+                "timeouts": timeouts,
+                "wait_mean_ms": total / checkouts * 1000 if checkouts else 0.0,
+                "wait_p50_ms": percentile(0.5),
+                "wait_p95_ms": percentile(0.95),
+                "wait_max_ms": longest * 1000}
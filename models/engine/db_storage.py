@@ -7,14 +7,18 @@ import models
 from models.amenity import Amenity
 from models.base_model import BaseModel, Base
 from models.city import City
+from models.engine import criteria
+from models.engine.db_pool import MeteredQueuePool
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
 from os import getenv
 import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import and_, create_engine, func, literal, or_, select
+from sqlalchemy import union_all
+from sqlalchemy.orm import joinedload, scoped_session, selectinload
+from sqlalchemy.orm import sessionmaker
 
 classes = {"Amenity": Amenity, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
@@ -24,28 +28,86 @@ class DBStorage:
     """interaacts with the MySQL database"""
     __engine = None
     __session = None
+    # number of rows fetched at a time when iterating over a whole table
+    __batch_size = 500
+    # tuple - (variable, create_engine argument, type, default) of every
+    # connection pool setting
+    __pool_settings = (("HBNB_MYSQL_POOL_SIZE", "pool_size", int, 5),
+                       ("HBNB_MYSQL_MAX_OVERFLOW", "max_overflow", int, 10),
+                       ("HBNB_MYSQL_POOL_TIMEOUT", "pool_timeout", float, 30),
+                       # below the wait_timeout of MySQL, 8 hours by default
+                       ("HBNB_MYSQL_POOL_RECYCLE", "pool_recycle", int, 3600),
+                       ("HBNB_MYSQL_POOL_PRE_PING", "pool_pre_ping", bool,
+                        True))
+    # int - connections the first reload opens, None for the pool size
+    __warm = None
+    # dictionary - loader option of every eager loading strategy
+    __strategies = {"selectin": selectinload, "joined": joinedload}
 
-    def __init__(self):
-        """Instantiate a DBStorage object"""
+    def __init__(self, engine=None):
+        """Instantiate a DBStorage object
+
+        The engine made by default has a MeteredQueuePool set by
+        the HBNB_MYSQL_POOL_* variables, and the first reload() opens
+        HBNB_MYSQL_POOL_WARM connections in it, the pool size by default.
+
+        Args:
+            engine (Engine): the engine of the database, by default the
+                MySQL one of the HBNB_MYSQL_* variables
+        """
         HBNB_MYSQL_USER = getenv('HBNB_MYSQL_USER')
         HBNB_MYSQL_PWD = getenv('HBNB_MYSQL_PWD')
         HBNB_MYSQL_HOST = getenv('HBNB_MYSQL_HOST')
         HBNB_MYSQL_DB = getenv('HBNB_MYSQL_DB')
         HBNB_ENV = getenv('HBNB_ENV')
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.
-                                      format(HBNB_MYSQL_USER,
-                                             HBNB_MYSQL_PWD,
-                                             HBNB_MYSQL_HOST,
-                                             HBNB_MYSQL_DB))
+        if engine is None:
+            engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.
+                                   format(HBNB_MYSQL_USER,
+                                          HBNB_MYSQL_PWD,
+                                          HBNB_MYSQL_HOST,
+                                          HBNB_MYSQL_DB),
+                                   **self.pool_options())
+        self.__engine = engine
+        if getenv('HBNB_MYSQL_POOL_WARM') is not None:
+            self.__warm = int(getenv('HBNB_MYSQL_POOL_WARM'))
         if HBNB_ENV == "test":
             Base.metadata.drop_all(self.__engine)
 
-    def all(self, cls=None):
-        """query on the current database session"""
+    @staticmethod
+    def pool_options():
+        """returns the create_engine arguments of the connection pool, as
+        set by the HBNB_MYSQL_POOL_* variables"""
+        options = {"poolclass": MeteredQueuePool}
+        for variable, name, kind, default in DBStorage.__pool_settings:
+            value = getenv(variable)
+            if value is None:
+                options[name] = default
+            elif kind is bool:
+                options[name] = value.lower() not in ("0", "false", "no")
+            else:
+                options[name] = kind(value)
+        return options
+
+    def pool_stats(self):
+        """returns the state of the connection pool and its checkout
+        statistics, None if the pool keeps none"""
+        if isinstance(self.__engine.pool, MeteredQueuePool):
+            return self.__engine.pool.stats()
+        return None
+
+    def all(self, cls=None, load=None):
+        """query on the current database session
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            load (dict): the eager loading strategy, "selectin" or
+                "joined", by relationship to load along with the objects
+        """
         new_dict = {}
         for clss in classes:
             if cls is None or cls is classes[clss] or cls is clss:
-                objs = self.__session.query(classes[clss]).all()
+                objs = self.__session.query(classes[clss]).options(
+                    *self.__options(classes[clss], load)).all()
                 for obj in objs:
                     key = obj.__class__.__name__ + '.' + obj.id
                     new_dict[key] = obj
@@ -67,32 +129,266 @@ class DBStorage:
     def reload(self):
         """reloads data from the database"""
         Base.metadata.create_all(self.__engine)
+        if self.__session is None and \
+                isinstance(self.__engine.pool, MeteredQueuePool):
+            # open the connections before the first requests need them
+            self.__engine.pool.warm(self.__warm)
         sess_factory = sessionmaker(bind=self.__engine, expire_on_commit=False)
         Session = scoped_session(sess_factory)
         self.__session = Session
 
-    def get(self, cls, id):
+    def __options(self, cls, load):
+        """returns the loader options of load for a query of cls
+
+        A relationship can be a dotted path through the related classes,
+        "cities.places" from State, loaded with the same strategy all
+        along.
+        """
+        options = []
+        for path, strategy in (load or {}).items():
+            loader = self.__strategies[strategy]
+            option = None
+            related = cls
+            for name in path.split("."):
+                attribute = getattr(related, name)
+                if option is None:
+                    option = loader(attribute)
+                else:
+                    option = getattr(option, loader.__name__)(attribute)
+                related = attribute.property.mapper.class_
+            options.append(option)
+        return options
+
+    def search_places(self, states=None, cities=None, amenities=None,
+                      after=None, limit=None, load=None):
+        """returns the places in the given states or cities
+
+        Only when that gives nothing are the places having all the listed
+        amenities returned instead, and with no filter at all every place
+        is. The filters run in SQL and places come ordered by
+        (created_at, id), starting after the after pair, limit at most;
+        without a limit they are returned by an iterator. load gives the
+        relationships to load along, as in all(). Ids that are not
+        strings match nothing.
+        """
+        query = self.__session.query(Place).options(
+            *self.__options(Place, load))
+        if states or cities:
+            state_ids = [id for id in states or () if isinstance(id, str)]
+            city_ids = [id for id in cities or () if isinstance(id, str)]
+            in_states = select(City.id).where(City.state_id.in_(state_ids))
+            located = query.filter(or_(Place.city_id.in_(in_states),
+                                       Place.city_id.in_(city_ids)))
+            if not amenities or \
+                    self.__session.query(located.exists()).scalar():
+                return self.__page(located, Place, after, limit)
+        if amenities:
+            having_all = self.__having_amenities(amenities)
+            if having_all is None:
+                return []
+            query = query.filter(Place.id.in_(having_all))
+        return self.__page(query, Place, after, limit)
+
+    def __having_amenities(self, ids):
+        """returns the SELECT of the ids of places having all amenities
+
+        The place_amenity primary key serves as the index of the places
+        of each amenity. Returns None if one of the amenities is unknown,
+        or its id is not a string.
+        """
+        from models.place import place_amenity
+        ids = list(ids)
+        if not all(isinstance(id, str) for id in ids):
+            return None
+        wanted = set(ids)
+        found = self.__session.query(func.count(Amenity.id)).filter(
+            Amenity.id.in_(wanted)).scalar()
+        if not wanted or found != len(wanted):
+            return None
+        return select(place_amenity.c.place_id).where(
+            place_amenity.c.amenity_id.in_(wanted)).group_by(
+            place_amenity.c.place_id).having(
+            func.count(place_amenity.c.amenity_id) == len(wanted))
+
+    def places_with_amenities(self, ids):
+        """returns the places having all the amenities of the ids list"""
+        having_all = self.__having_amenities(ids)
+        if having_all is None:
+            return []
+        return self.__session.query(Place).filter(
+            Place.id.in_(having_all)).all()
+
+    def amenity_facets(self, place_ids):
+        """returns how many of the places of place_ids have each amenity
+
+        Return:
+            dictionary of the counts by amenity id, for amenities of at
+            least one of the places
+        """
+        from models.place import place_amenity
+        place_ids = [id for id in place_ids if isinstance(id, str)]
+        facets = {}
+        for start in range(0, len(place_ids), 500):
+            rows = self.__session.query(
+                place_amenity.c.amenity_id,
+                func.count(place_amenity.c.place_id)).filter(
+                place_amenity.c.place_id.in_(
+                    place_ids[start:start + 500])).group_by(
+                place_amenity.c.amenity_id)
+            for amenity_id, count in rows:
+                facets[amenity_id] = facets.get(amenity_id, 0) + count
+        return facets
+
+    def page(self, cls, where=None, after=None, limit=None, load=None):
+        """returns one page of the objects of cls ordered by (created_at, id)
+
+        The page is a keyset query with a LIMIT, served by the index on
+        created_at.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): column values the objects must have
+            after (tuple): the (created_at, id) the page starts after
+            limit (int): the page size, None for an iterator over all
+            load (dict): the relationships to load along, as in all()
+        """
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
+            return []
+        query = self.__session.query(cls).options(
+            *self.__options(cls, load))
+        if where:
+            query = query.filter_by(**where)
+        return self.__page(query, cls, after, limit)
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=None,
+              load=None):
+        """returns the objects of cls meeting the conditions of where
+
+        The conditions, ordering and window are compiled to a single
+        SELECT, as models.engine.criteria describes them.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): the conditions by attribute
+            order_by (str or list): the attributes to order by
+            limit (int): the number of objects at most, None for all
+            offset (int): the number of objects to skip first
+            load (dict): the relationships to load along, as in all()
+
+        Raises:
+            ValueError: an attribute is not a column of cls, or an
+                operator is unknown
+        """
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
+            return []
+        query = self.__session.query(cls).options(*self.__options(cls, load))
+        for attr, op, value in criteria.conditions(where):
+            column = self.__column(cls, attr)
+            if op == "in":
+                query = query.filter(column.in_(value))
+            else:
+                query = query.filter(criteria.operators[op](column, value))
+        for attr, descending in criteria.ordering(order_by):
+            column = self.__column(cls, attr)
+            query = query.order_by(column.desc() if descending else column)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @staticmethod
+    def __column(cls, attr):
+        """returns the column of cls named attr
+
+        Raises:
+            ValueError: cls has no such column
+        """
+        if attr not in cls.__table__.columns:
+            raise ValueError("{} has no column {}".format(cls.__name__, attr))
+        return getattr(cls, attr)
+
+    def __page(self, query, cls, after=None, limit=None):
+        """returns the rows of query by (created_at, id), after and limit
+
+        Without a limit, returns an iterator loading the rows in batches.
+        """
+        if after is not None:
+            created_at, id = after
+            query = query.filter(or_(cls.created_at > created_at,
+                                     and_(cls.created_at == created_at,
+                                          cls.id > id)))
+        query = query.order_by(cls.created_at, cls.id)
+        if limit is None:
+            return iter(query.yield_per(self.__batch_size))
+        return query.limit(limit).all()
+
+    def get(self, cls, id, load=None):
         """Retrives one object
         Args:
+            cls (class or str): The class of the object, or its name
+            id (str): The object identifier
+            load (dict): the relationships to load along, as in all()
         """
         if cls and id:
+            cls = classes.get(cls, cls)
             if cls in classes.values() and isinstance(id, str):
-                class_obj = self.all(cls)
-                for key, value in class_obj.items():
-                    if key.split(".")[1] == id:
-                        return value
+                return self.__session.get(cls, id,
+                                          options=self.__options(cls, load))
             else:
                 return
         return
 
-    def count(self, cls):
+    def get_many(self, cls, ids, load=None):
+        """Retrieves the objects of cls whose ids are listed
+
+        Runs a SELECT ... WHERE id IN (...) for every __batch_size ids.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            ids (iterable): The object identifiers
+            load (dict): the relationships to load along, as in all()
+
+        Return:
+            dictionary of the objects found by id
+        """
+        cls = classes.get(cls, cls)
+        if cls not in classes.values():
+            return {}
+        ids = list(dict.fromkeys(id for id in ids if isinstance(id, str)))
+        found = {}
+        for start in range(0, len(ids), self.__batch_size):
+            query = self.__session.query(cls).options(
+                *self.__options(cls, load)).filter(
+                cls.id.in_(ids[start:start + self.__batch_size]))
+            for obj in query:
+                found[obj.id] = obj
+        return found
+
+    def count(self, cls=None):
         """Counts object occurrances
+
+        Runs a SELECT COUNT(*) instead of loading the rows.
         """
         if cls:
+            cls = classes.get(cls, cls)
             if cls in classes.values():
-                return len(self.all(cls))
+                return self.__session.query(func.count(cls.id)).scalar()
             return
-        return len(self.all())
+        return sum(self.counts().values())
+
+    def counts(self):
+        """Counts the objects of every class in a single query
+
+        Return:
+            dictionary of the counts by class name
+        """
+        query = union_all(*[select(literal(name), func.count(cls.id))
+                            for name, cls in classes.items()])
+        return {name: count
+                for name, count in self.__session.execute(query)}
 
     def close(self):
         """call remove() method on the private session attribute"""
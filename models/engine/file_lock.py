@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Contains the FileLock class
+"""
+
+from contextlib import contextmanager
+import fcntl
+import os
+import threading
+
+_generation = "{:020d}\n"
+
+
+class FileLock:
+    """advisory lock and generation number of the files at a path
+
+    Every process writing the files at a path holds an exclusive fcntl
+    lock on <path>.lock while it writes, and bumps the generation number
+    kept in that file once it is done. Another process that finds the
+    generation changed knows it has to read the files again. The lock can
+    be taken again by the thread holding it, and only one thread of the
+    process holds it at once.
+    """
+
+    def __init__(self):
+        """Instantiate a FileLock"""
+        self.__mutex = threading.RLock()
+        # dictionary - (file descriptor, depth) of the held locks by path
+        self.__held = {}
+
+    @staticmethod
+    def path(path):
+        """returns the path of the lock file of the files at path"""
+        return path + ".lock"
+
+    def generation(self, path):
+        """returns the generation number of the files at path, 0 if none"""
+        try:
+            with open(self.path(path), 'rb') as f:
+                return int(f.read(len(_generation.format(0))) or 0)
+        except (OSError, ValueError):
+            return 0
+
+    @contextmanager
+    def hold(self, path):
+        """holds the lock of the files at path during the block"""
+        with self.__mutex:
+            fd, depth = self.__held.get(path, (None, 0))
+            if fd is None:
+                fd = os.open(self.path(path), os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except OSError:
+                    os.close(fd)
+                    raise
+            self.__held[path] = (fd, depth + 1)
+            try:
+                yield
+            finally:
+                if depth:
+                    self.__held[path] = (fd, depth)
+                else:
+                    del self.__held[path]
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+
+    def bump(self, path):
+        """increments the generation number of the files at path, whose
+        lock must be held, and returns it"""
+        fd, depth = self.__held[path]
+        generation = self.generation(path) + 1
+        os.pwrite(fd, _generation.format(generation).encode(), 0)
+        return generation
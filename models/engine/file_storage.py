@@ -3,91 +3,1293 @@
 Contains the FileStorage class
 """
 
-import json
+import atexit
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+import logging
 from models.amenity import Amenity
-from models.base_model import BaseModel
+from models.base_model import BaseModel, time
 from models.city import City
+from models.engine import criteria
+from models.engine.file_lock import FileLock
+from models.engine.journal import Journal
+from models.engine.rwlock import ReadWriteLock
+from models.engine import snapshot
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+import os
+import re
+import threading
+from time import monotonic, sleep
+from types import MappingProxyType
+import zlib
 
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+logger = logging.getLogger(__name__)
 
 
 class FileStorage:
     """serializes instances to a JSON file & deserializes back to instances"""
 
-    # string - path to the JSON file
-    __file_path = "file.json"
+    # string - snapshot format, set with HBNB_FILE_FORMAT=binary to use
+    # the compact binary format instead of JSON
+    __format = "binary" if os.getenv("HBNB_FILE_FORMAT") == "binary" \
+        else "json"
+    # string - path to the JSON (or binary) file
+    __file_path = "file.hbnb" if __format == "binary" else "file.json"
+    # int - set with HBNB_FILE_SHARDS to store the objects of every class
+    # in that many files, by hash of their id, instead of all in
+    # __file_path: file.State.0.json, file.State.1.json...
+    __shards = int(os.getenv("HBNB_FILE_SHARDS", 0))
+    # boolean - files of another layout were read, for the next save to
+    # replace them all
+    __relayout = False
     # dictionary - empty but will store all objects by <class name>.id
     __objects = {}
+    # dictionary - the same objects partitioned by <class name>
+    __partitions = {}
+    # dictionary - records read from the file but not built into objects
+    # yet, by key, partitioned by <class name>
+    __pending = {}
+    # boolean - set with HBNB_FILE_LAZY=1 to build objects from their
+    # records only when they are first accessed
+    __lazy = os.getenv("HBNB_FILE_LAZY") == "1"
+    # dictionary - the __objects the partitions were built from
+    __partitioned_from = None
+    # set - names of the partitions all() handed out, and None for
+    # __objects, each replaced by a copy before it next changes
+    __shared = set()
+    # dictionary - foreign keys kept in reverse indexes, by class name
+    __foreign_keys = {"City": ("state_id",),
+                      "Place": ("city_id", "user_id"),
+                      "Review": ("place_id", "user_id")}
+    # dictionary - reverse indexes by (<class name>, <foreign key>), each
+    # mapping a referenced id to the referencing objects by key
+    __references = {}
+    # dictionary - (<class name>, foreign key values, amenity ids)
+    # indexed, by key
+    __referenced = {}
+    # dictionary - inverted index of the keys of the places having each
+    # amenity, by amenity id
+    __amenity_places = {}
+    # dictionary - sorted lists of the (created_at, id) of the objects of
+    # a class, by class name, built when a page of the class is first read
+    # (created_at as a string, so that pending records need not be built)
+    __ordered = {}
+    # Journal - set with HBNB_FILE_JOURNAL=1 to append changes to a log
+    # instead of rewriting the JSON file on every save
+    __journal = None
+    if os.getenv("HBNB_FILE_JOURNAL") == "1":
+        __journal = Journal(__file_path + ".log")
+    # number of journal records after which the log is compacted
+    __compact_after = int(os.getenv("HBNB_FILE_COMPACT_AFTER", 10000))
+    # dictionary - changes since the last save, None for a deleted object
+    __changes = {}
+    # Thread - compaction running in the background, if any
+    __compaction = None
+    # dictionary - updated_at of every object as last read or written
+    __stamps = {}
+    # dictionary - (object or pending record, format, serialized record,
+    # updated_at) of every key as last written, reused for the objects
+    # that are not dirty
+    __fragments = {}
+    # tuple - stat signature and generation number of the files as last
+    # read or written
+    __synced = None
+    # tuple - generation number of the files and the paths of the data
+    # files listed at that generation, None until listed again
+    __layout = None
+    # FileLock - held while writing the files, so that processes sharing
+    # them write one at a time, each over the changes of the others
+    __file_lock = FileLock()
+    # float - seconds; with HBNB_FILE_FLUSH_INTERVAL set, save() only marks
+    # the storage dirty and a background thread writes it at most that
+    # long afterwards
+    __flush_interval = float(os.getenv("HBNB_FILE_FLUSH_INTERVAL", 0))
+    # int - number of unsaved changes after which the thread writes at once
+    __flush_after = int(os.getenv("HBNB_FILE_FLUSH_AFTER", 100))
+    # float - monotonic time of the first save waiting for the thread,
+    # None when nothing waits
+    __dirty_since = None
+    # Thread - the background flusher, once started
+    __flusher = None
+    # Condition - guards __dirty_since, and wakes the flusher up; never
+    # held while writing, so that save() does not wait for a write
+    __lock = threading.Condition(threading.RLock())
+    # RLock - held while the changes saved in write-behind mode are
+    # written, so that flush() waits for a write under way
+    __writing = threading.RLock()
+    # ReadWriteLock - shared by the methods reading the objects, held
+    # alone by those changing them
+    __rw = ReadWriteLock()
+    # string - when writes are flushed to disk with fsync, set with
+    # HBNB_FILE_FSYNC: "always", on every write, "interval", by a
+    # background thread HBNB_FILE_FSYNC_INTERVAL seconds after a write,
+    # or "never", the default
+    __fsync = os.getenv("HBNB_FILE_FSYNC", "never")
+    __fsync_interval = float(os.getenv("HBNB_FILE_FSYNC_INTERVAL", 1))
+    # set - paths of the files and directories written since the syncer
+    # last flushed them to disk
+    __unsynced = set()
+    # Condition - guards __unsynced, and wakes the syncer up
+    __sync_lock = threading.Condition()
+    # Thread - the background syncer, once started
+    __syncer = None
+    # number of times a torn file is read again before giving up
+    __read_retries = 3
+    # int - size in bytes above which a data file is checked, then parsed
+    # one record at a time rather than read and parsed at once, set with
+    # HBNB_FILE_STREAM_SIZE
+    __stream_size = int(os.getenv("HBNB_FILE_STREAM_SIZE", 64 << 20))
 
-    def all(self, cls=None):
-        """returns the dictionary __objects"""
-        if cls is not None:
-            new_dict = {}
-            for key, value in self.__objects.items():
-                if cls == value.__class__ or cls == value.__class__.__name__:
-                    new_dict[key] = value
-            return new_dict
-        return self.__objects
+    def __init__(self):
+        """Instantiate a FileStorage
+
+        Raises:
+            ValueError: both HBNB_FILE_SHARDS and the binary format are
+                set; MappedStorage maps the single binary file, which
+                the shards would replace
+        """
+        if self.__shards and self.__format == "binary":
+            raise ValueError("HBNB_FILE_SHARDS cannot be used with "
+                             "HBNB_FILE_FORMAT=binary")
+
+    def all(self, cls=None, load=None):
+        """returns the dictionary __objects
+
+        With a class or class name, returns a read-only view of the
+        objects of that class only. Pending records are built first.
+        Either is a snapshot: the dictionary handed out is copied before
+        new(), delete() or a reload next change it, so it never changes
+        underneath its caller. load, the relationships DBStorage would
+        load along, is ignored: the related objects are found from the
+        indexes.
+        """
+        with self.__reading(cls):
+            if cls is not None:
+                self.__hydrate(cls)
+                name = cls if isinstance(cls, str) else cls.__name__
+                partition = self.__partition(name)
+                if name in classes:
+                    self.__shared.add(name)
+                return MappingProxyType(partition)
+            for name in list(self.__pending):
+                self.__hydrate(name)
+            self.__shared.add(None)
+            return self.__objects
+
+    @contextmanager
+    def __reading(self, cls=None, key=None):
+        """holds the lock for a read of the objects of cls, of the object
+        at key, or of every object
+
+        The read lock is taken first. Should the read build pending
+        records, which changes the dictionaries other readers go through,
+        it is traded for the write lock: the check is only made once the
+        read lock is held, since a reload may add pending records until
+        then. In lazy mode, reads of a class thus exclude each other only
+        until its records are built, and reads of built classes or
+        objects share the lock as usual.
+        """
+        with self.__rw.read():
+            if key is not None:
+                pending = key in self.__pending.get(key.partition(".")[0],
+                                                    ())
+            elif cls is not None:
+                name = cls if isinstance(cls, str) else cls.__name__
+                pending = bool(self.__pending.get(name))
+            else:
+                pending = any(self.__pending.values())
+            if not pending:
+                yield
+                return
+        with self.__rw.write():
+            yield
+
+    def __fork(self):
+        """replaces __objects and the partitions by copies
+
+        Changes applied by a reload go to the copies, so that code still
+        going through the previous dictionaries is not disturbed.
+        """
+        partitions = self.__partitioned()
+        objects = dict(self.__objects)
+        FileStorage.__partitions = {name: dict(partition) for name,
+                                    partition in partitions.items()}
+        FileStorage.__objects = objects
+        FileStorage.__partitioned_from = objects
+        self.__shared.clear()
+
+    def __writable(self, name):
+        """returns __objects and the partition of class name, to be
+        changed, replacing first by a copy either of them all() handed
+        out since it last changed"""
+        partitions = self.__partitioned()
+        if None in self.__shared:
+            objects = dict(self.__objects)
+            FileStorage.__objects = objects
+            FileStorage.__partitioned_from = objects
+            self.__shared.discard(None)
+        if name in self.__shared:
+            partitions[name] = dict(partitions[name])
+            self.__shared.discard(name)
+        return self.__objects, self.__partition(name)
+
+    def __partitioned(self):
+        """returns __partitions, rebuilt if __objects was replaced"""
+        if self.__partitioned_from is not self.__objects:
+            partitions = {}
+            FileStorage.__pending = {}
+            FileStorage.__references = {}
+            FileStorage.__referenced = {}
+            FileStorage.__amenity_places = {}
+            FileStorage.__ordered = {}
+            for key, obj in self.__objects.items():
+                name = obj.__class__.__name__
+                partitions.setdefault(name, {})[key] = obj
+                self.__index(key, obj)
+            FileStorage.__partitions = partitions
+            FileStorage.__partitioned_from = self.__objects
+            self.__shared.clear()
+        return self.__partitions
+
+    def __partition(self, cls):
+        """returns the dictionary of the built objects of cls by key"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in classes:
+            return {}
+        return self.__partitioned().setdefault(name, {})
+
+    def __pending_records(self, name):
+        """returns the dictionary of the pending records of a class by key"""
+        self.__partitioned()
+        if name not in classes:
+            return {}
+        return self.__pending.setdefault(name, {})
+
+    def __hydrate(self, cls):
+        """builds every pending record of cls into an object"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        for key in list(self.__pending_records(name)):
+            self.__resolve(key)
+
+    def __resolve(self, key):
+        """returns the object at key, building it from its pending record"""
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return obj
+        name = key.partition(".")[0]
+        data = self.__pending_records(name).pop(key, None)
+        if data is None:
+            return None
+        obj = classes[name](**data)
+        # the object is as stored
+        obj._dirty = False
+        # indexes and ordering already account for the record
+        objects, partition = self.__writable(name)
+        partition[key] = obj
+        objects[key] = obj
+        return obj
+
+    def __exists(self, key):
+        """tells whether an object or pending record is stored at key"""
+        return key in self.__objects or \
+            key in self.__pending_records(key.partition(".")[0])
+
+    def __item(self, key):
+        """returns the object or pending record stored at key, or None"""
+        obj = self.__objects.get(key)
+        if obj is None:
+            return self.__pending_records(key.partition(".")[0]).get(key)
+        return obj
+
+    def __items(self):
+        """yields (key, object or pending record) for everything stored
+
+        Items come grouped by class, built objects first.
+        """
+        partitions = self.__partitioned()
+        for name in classes:
+            for key, obj in partitions.get(name, {}).items():
+                yield key, obj
+            for key, data in self.__pending.get(name, {}).items():
+                yield key, data
+
+    @staticmethod
+    def __field(item, attr):
+        """returns attribute attr of an object or pending record"""
+        if isinstance(item, dict):
+            if attr in item:
+                return item[attr]
+            return getattr(classes[item["__class__"]], attr, None)
+        return getattr(item, attr, None)
+
+    @staticmethod
+    def __sort_key(item):
+        """returns the (created_at, id) of an object or pending record
+
+        created_at is kept in its string form, which sorts the same way
+        and does not need a record to be built.
+        """
+        if isinstance(item, dict):
+            return (FileStorage.__text(item.get("created_at", "")),
+                    item.get("id", ""))
+        return (item.created_at.strftime(time), item.id)
+
+    @staticmethod
+    def __text(value):
+        """returns a datetime of a record in its string form
+
+        Records of a binary snapshot hold datetimes, JSON ones strings.
+        """
+        if isinstance(value, datetime):
+            return value.strftime(time)
+        return value
+
+    def __index(self, key, item):
+        """adds item to the reverse indexes of its foreign keys"""
+        self.__unindex(key)
+        name = item["__class__"] if isinstance(item, dict) else \
+            item.__class__.__name__
+        foreign_keys = self.__foreign_keys.get(name)
+        if not foreign_keys:
+            return
+        values = tuple(self.__field(item, fk) for fk in foreign_keys)
+        for fk, value in zip(foreign_keys, values):
+            index = self.__references.setdefault((name, fk), {})
+            index.setdefault(value, {})[key] = None
+        amenity_ids = tuple(self.__field(item, "amenity_ids") or ())
+        for amenity_id in amenity_ids:
+            self.__amenity_places.setdefault(amenity_id, set()).add(key)
+        self.__referenced[key] = (name, values, amenity_ids)
+
+    def __unindex(self, key):
+        """removes the object at key from the reverse indexes"""
+        indexed = self.__referenced.pop(key, None)
+        if indexed is None:
+            return
+        name, values, amenity_ids = indexed
+        for fk, value in zip(self.__foreign_keys[name], values):
+            index = self.__references.get((name, fk), {})
+            referencing = index.get(value, {})
+            referencing.pop(key, None)
+            if not referencing:
+                index.pop(value, None)
+        for amenity_id in amenity_ids:
+            place_keys = self.__amenity_places.get(amenity_id, set())
+            place_keys.discard(key)
+            if not place_keys:
+                self.__amenity_places.pop(amenity_id, None)
+
+    def __order(self, name, old, item):
+        """replaces old by item in the sorted list of the class, if any"""
+        ordered = self.__ordered.get(name)
+        if ordered is None:
+            return
+        entry = None if item is None else self.__sort_key(item)
+        if old is not None:
+            old_entry = self.__sort_key(old)
+            if old_entry == entry:
+                return
+            i = bisect_left(ordered, old_entry)
+            if i < len(ordered) and ordered[i] == old_entry:
+                del ordered[i]
+        if entry is not None:
+            insort(ordered, entry)
+
+    def __put(self, key, item):
+        """stores an object or pending record at key, and indexes it"""
+        name = key.partition(".")[0]
+        old = self.__item(key)
+        self.__fragments.pop(key, None)
+        self.__pending_records(name).pop(key, None)
+        objects, partition = self.__writable(name)
+        if isinstance(item, dict):
+            partition.pop(key, None)
+            objects.pop(key, None)
+            self.__pending_records(name)[key] = item
+        else:
+            partition[key] = item
+            objects[key] = item
+        self.__order(name, old, item)
+        self.__index(key, item)
+
+    def __drop(self, key):
+        """removes the object or pending record at key and unindexes it"""
+        name = key.partition(".")[0]
+        self.__fragments.pop(key, None)
+        item = self.__pending_records(name).pop(key, None)
+        if key in self.__objects:
+            objects, partition = self.__writable(name)
+            item = objects.pop(key)
+            partition.pop(key, None)
+        if item is not None:
+            self.__unindex(key)
+            self.__order(name, item, None)
+        return item
+
+    def referencing(self, cls, attr, value):
+        """returns the list of objects of cls whose attribute attr is value
+
+        Foreign keys listed in __foreign_keys are answered from their
+        reverse index, any other attribute by scanning the class objects.
+        An object whose foreign key is set is indexed again by reindex();
+        hits whose key was changed past it, such as through __dict__,
+        are left out.
+        """
+        with self.__reading(cls):
+            name = cls if isinstance(cls, str) else cls.__name__
+            if attr in self.__foreign_keys.get(name, ()):
+                self.__partitioned()
+                index = self.__references.get((name, attr), {})
+                objs = [self.__resolve(key) for key in index.get(value, ())]
+                return [obj for obj in objs
+                        if getattr(obj, attr, None) == value]
+            return [obj for obj in self.all(name).values()
+                    if getattr(obj, attr, None) == value]
+
+    def reindex(self, obj, attr):
+        """indexes obj again once its attribute attr was set, when it is
+        stored here and attr is one of its foreign keys or amenity_ids"""
+        name = obj.__class__.__name__
+        foreign_keys = self.__foreign_keys.get(name)
+        if not foreign_keys or \
+                attr not in foreign_keys and attr != "amenity_ids":
+            return
+        key = name + "." + str(getattr(obj, "id", ""))
+        with self.__rw.write():
+            if self.__objects.get(key) is obj:
+                self.__partitioned()
+                self.__index(key, obj)
 
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
         if obj is not None:
             key = obj.__class__.__name__ + "." + obj.id
-            self.__objects[key] = obj
+            with self.__rw.write():
+                self.__put(key, obj)
+                self.__changes[key] = obj
 
     def save(self):
-        """serializes __objects to the JSON file (path: __file_path)"""
-        json_objects = {}
-        for key in self.__objects:
-            json_objects[key] = self.__objects[key].to_dict()
-        with open(self.__file_path, 'w') as f:
-            json.dump(json_objects, f)
-
-    def reload(self):
-        """deserializes the JSON file to __objects"""
+        """serializes __objects to the JSON file (path: __file_path)
+
+        In journaled mode only the changes since the last save are
+        appended to the log, which is compacted once it grows too long.
+        In write-behind mode the storage is only marked dirty, for the
+        flusher thread to write.
+        """
+        if self.__flush_interval > 0:
+            with self.__lock:
+                if self.__dirty_since is None:
+                    FileStorage.__dirty_since = monotonic()
+                self.__start_flusher()
+            return
+        self.__write()
+
+    def flush(self):
+        """writes the changes saved in write-behind mode right away, once
+        a write under way is done"""
+        with self.__writing:
+            self.__write_behind()
+
+    def __write_behind(self):
+        """writes the changes saved in write-behind mode, if any, with
+        __writing held
+
+        The storage is taken as clean before writing, so that a save()
+        meanwhile marks it dirty again; it is marked dirty again as well
+        when the write fails.
+        """
+        with self.__lock:
+            since = self.__dirty_since
+            FileStorage.__dirty_since = None
+        if since is None:
+            return
+        try:
+            self.__write()
+        except BaseException:
+            with self.__lock:
+                if self.__dirty_since is None:
+                    FileStorage.__dirty_since = since
+            raise
+
+    def __start_flusher(self):
+        """starts the flusher thread, and flushes at exit, the first time"""
+        if self.__flusher is not None:
+            self.__lock.notify()
+            return
+        thread = threading.Thread(target=self.__flush_loop, daemon=True)
+        FileStorage.__flusher = thread
+        thread.start()
+        atexit.register(self.flush)
+
+    def __flush_loop(self):
+        """writes the dirty storage __flush_interval seconds after it was
+        first saved, or as soon as __flush_after changes are waiting
+
+        The write happens past __lock, so that save() does not wait for
+        it. A failed write is logged and retried, so that the thread
+        keeps running whatever the error.
+        """
+        while True:
+            with self.__lock:
+                if self.__dirty_since is None:
+                    self.__lock.wait()
+                    continue
+                remaining = self.__dirty_since + self.__flush_interval - \
+                    monotonic()
+                if remaining > 0 and \
+                        len(self.__changes) < self.__flush_after:
+                    self.__lock.wait(remaining)
+                    continue
+            try:
+                with self.__writing:
+                    self.__write_behind()
+            except Exception:
+                logger.exception("Writing the saved changes failed")
+                # still dirty: retried after another interval
+                with self.__lock:
+                    FileStorage.__dirty_since = monotonic()
+
+    def __write(self):
+        """writes the changes to the JSON file or journal
+
+        The files are locked against other processes meanwhile. What
+        they wrote since the files were last read or written here is
+        applied first, so that only the keys changed here are written
+        over it, and the generation number is bumped once done. The
+        changes are only forgotten once written, so that a failed write
+        can be retried.
+        """
+        with self.__file_lock.hold(self.__file_path):
+            self.close()
+            with self.__rw.read():
+                changes = self.__changes
+                if self.__journal is None and self.__shards and \
+                        not self.__relayout:
+                    self.__stamps.update(self.__write_files(
+                        self.__items(), cache=True,
+                        dirty=self.__dirty_shards()))
+                    for key, obj in changes.items():
+                        if obj is None:
+                            self.__stamps.pop(key, None)
+                elif self.__journal is None:
+                    FileStorage.__stamps = self.__write_files(
+                        self.__items(), cache=True)
+                else:
+                    records = []
+                    for key, obj in changes.items():
+                        if obj is None:
+                            self.__stamps.pop(key, None)
+                            records.append((key, None))
+                        else:
+                            data = obj.to_dict()
+                            self.__stamps[key] = data.get("updated_at")
+                            records.append((key, data))
+                    self.__journal.append(
+                        records, sync=self.__fsync == "always")
+                    if self.__fsync == "interval":
+                        self.__sync_later(self.__journal.path)
+                FileStorage.__changes = {}
+                self.__file_lock.bump(self.__file_path)
+                FileStorage.__synced = self.__signature()
+            if self.__journal is not None and \
+                    self.__journal.records >= self.__compact_after:
+                self.compact()
+
+    def compact(self, background=True):
+        """folds the journal back into the JSON file
+
+        The live log segment is rotated aside and a snapshot of the
+        current objects is written by a background thread, which then
+        discards the rotated segment. Returns the thread, if one started.
+        """
+        if self.__journal is None:
+            return None
+        running = self.__compaction
+        if running is not None and running.is_alive():
+            return None
+        with self.__file_lock.hold(self.__file_path):
+            # the snapshot must hold what other processes logged too
+            self.close()
+            with self.__rw.read():
+                self.__journal.rotate()
+                rotated = self.__rotated()
+                items = list(self.__items())
+        thread = threading.Thread(target=self.__fold, args=(items, rotated),
+                                  daemon=False)
+        FileStorage.__compaction = thread
+        if background:
+            thread.start()
+        else:
+            thread.run()
+        return thread
+
+    def __fold(self, items, rotated):
+        """writes a snapshot of items and drops the rotated log segment
+
+        Nothing is done when another process rotated the log into the
+        segment since, its own compaction then superseding this one.
+        """
+        with self.__file_lock.hold(self.__file_path):
+            if self.__rotated() != rotated:
+                return
+            self.__write_files(items)
+            self.__journal.discard_rotated()
+
+    def __rotated(self):
+        """returns the (inode, size) of the rotated log segment, or None"""
         try:
-            with open(self.__file_path, 'r') as f:
-                jo = json.load(f)
-            for key in jo:
-                self.__objects[key] = classes[jo[key]["__class__"]](**jo[key])
-        except Exception:
-            pass
+            st = os.stat(self.__journal.rotated_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size)
+
+    def __sync_later(self, path):
+        """has the syncer flush the file or directory at path to disk
+        within __fsync_interval seconds, starting it the first time"""
+        with self.__sync_lock:
+            self.__unsynced.add(path)
+            if self.__syncer is None:
+                thread = threading.Thread(target=self.__sync_loop,
+                                          daemon=True)
+                FileStorage.__syncer = thread
+                thread.start()
+                atexit.register(self.__sync_pending)
+            self.__sync_lock.notify()
+
+    def __sync_loop(self):
+        """flushes the written files to disk __fsync_interval seconds
+        after the first of them was written"""
+        while True:
+            with self.__sync_lock:
+                while not self.__unsynced:
+                    self.__sync_lock.wait()
+            sleep(self.__fsync_interval)
+            self.__sync_pending()
+
+    def __sync_pending(self):
+        """flushes to disk the files and directories written since the
+        last time, logging the errors"""
+        with self.__sync_lock:
+            paths = set(self.__unsynced)
+            self.__unsynced.clear()
+        for path in sorted(paths):
+            try:
+                self.__fsync_path(path)
+            except FileNotFoundError:
+                # removed since, by a compaction that synced its own file
+                pass
+            except OSError:
+                logger.exception("Flushing %s to disk failed", path)
+
+    @staticmethod
+    def __fsync_path(path):
+        """flushes the file or directory at path to disk"""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __shard_path(self, key):
+        """returns the path of the shard file holding the object at key"""
+        name, _, id = key.partition(".")
+        root, ext = os.path.splitext(self.__file_path)
+        return "{}.{}.{}{}".format(root, name,
+                                   zlib.crc32(id.encode()) % self.__shards,
+                                   ext)
+
+    def __dirty_shards(self):
+        """returns the paths of the shards holding a changed object"""
+        paths = {self.__shard_path(key) for key in self.__changes}
+        for key, obj in self.__objects.items():
+            if getattr(obj, "_dirty", False):
+                paths.add(self.__shard_path(key))
+        return paths
+
+    def __data_files(self):
+        """returns the paths of the data files there are, of any layout:
+        __file_path and the shards of every class"""
+        root, ext = os.path.splitext(self.__file_path)
+        directory, root = os.path.split(root)
+        shard = re.compile(re.escape(root) + r"\.(\w+)\.[0-9]+" +
+                           re.escape(ext))
+        try:
+            names = os.listdir(directory or ".")
+        except OSError:
+            names = []
+        paths = []
+        for name in sorted(names):
+            match = shard.fullmatch(name)
+            if match is not None and match.group(1) in classes:
+                paths.append(os.path.join(directory, name))
+        if os.path.exists(self.__file_path):
+            paths.insert(0, self.__file_path)
+        return paths
+
+    def __in_layout(self, path):
+        """tells whether the data file at path is one of the layout set by
+        __shards"""
+        if not self.__shards or path == self.__file_path:
+            return not self.__shards and path == self.__file_path
+        ext = os.path.splitext(self.__file_path)[1]
+        index = path[:len(path) - len(ext)].rpartition(".")[2]
+        return int(index) < self.__shards
+
+    def __write_files(self, items, cache=False, dirty=None):
+        """writes the (key, obj) pairs of items to the data files
+
+        With __shards, items go to the shard of their key, and only the
+        shards of dirty are written when it is given; a shard left empty
+        is removed. Without dirty, the files of another layout are
+        removed once the new ones are written. Returns the updated_at of
+        every written record by key.
+        """
+        if not self.__shards:
+            stamps = self.__write_snapshot(items, cache)
+            written = {self.__file_path}
+        else:
+            shards = {}
+            for key, obj in items:
+                path = self.__shard_path(key)
+                if dirty is None or path in dirty:
+                    shards.setdefault(path, []).append((key, obj))
+            stamps = {}
+            for path in sorted(shards.keys() | (dirty or set())):
+                if path in shards:
+                    stamps.update(self.__write_snapshot(shards[path], cache,
+                                                        path))
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            written = shards.keys()
+        if dirty is None:
+            for path in self.__data_files():
+                if path not in written:
+                    os.remove(path)
+            FileStorage.__relayout = False
+        FileStorage.__layout = None
+        return stamps
+
+    def __write_snapshot(self, items, cache=False, path=None):
+        """dumps the (key, obj) pairs of items to the JSON file
+
+        Objects are serialized one at a time, in the format of __format,
+        and pending records are written back as they were read. With
+        cache, the serialized records are kept in __fragments and those
+        of the objects that are not dirty are written again as they are,
+        so that a save only serializes what changed. The snapshot is
+        written to a temporary file that then replaces the JSON file at
+        once, so readers see either the old or the new file in full.
+        The file is path, __file_path by default. Returns the updated_at
+        of every record by key.
+        """
+        path = path or self.__file_path
+        stamps = {}
+        fragments = {}
+        cleared = []
+        serialize, write = snapshot.serializers[self.__format]
+
+        def records():
+            """yields the serialized record of every item"""
+            for key, obj in items:
+                entry = self.__fragments.get(key) if cache else None
+                if entry is not None and entry[0] is obj and \
+                        entry[1] == self.__format and \
+                        not getattr(obj, "_dirty", False):
+                    fragments[key] = entry
+                    stamps[key] = entry[3]
+                    yield entry[2]
+                    continue
+                if isinstance(obj, dict):
+                    data = obj
+                else:
+                    if cache:
+                        # cleared first, so that a change made meanwhile
+                        # marks the object dirty again
+                        obj._dirty = False
+                        cleared.append(obj)
+                    data = obj.to_dict()
+                stamp = self.__text(data.get("updated_at"))
+                raw = serialize(key, data)
+                fragments[key] = (obj, self.__format, raw, stamp)
+                stamps[key] = stamp
+                yield raw
+        tmp_path = path + ".tmp"
+        # a file replacing a synced one must be on disk first
+        sync = self.__fsync != "never"
+        try:
+            with open(tmp_path, 'w+b') as f:
+                write(f, records())
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            # not written after all
+            for obj in cleared:
+                obj._dirty = True
+            raise
+        if cache:
+            self.__fragments.update(fragments)
+        # make the rename itself durable
+        directory = os.path.dirname(path) or "."
+        if self.__fsync == "always":
+            self.__fsync_path(directory)
+        elif sync:
+            self.__sync_later(directory)
+        return stamps
+
+    def __signature(self):
+        """returns the (path, inode, size, mtime) of the data files, oldest
+        first, the (inode, size, mtime) of the journal, then their
+        generation number
+
+        The data files are only listed again when the generation changed
+        or the files were written or read since, as other processes bump
+        it whenever they write; __file_path is looked at every time.
+        """
+        generation = self.__file_lock.generation(self.__file_path)
+        layout = self.__layout
+        if layout is None or layout[0] != generation:
+            layout = (generation, self.__data_files())
+            FileStorage.__layout = layout
+        files = []
+        for path in {self.__file_path, *layout[1]}:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, path, st.st_ino, st.st_size))
+        files.sort()
+        signature = [tuple((path, ino, size, mtime)
+                           for mtime, path, ino, size in files)]
+        if self.__journal is not None:
+            try:
+                st = os.stat(self.__journal.path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        signature.append(generation)
+        return tuple(signature)
+
+    def __apply(self, key, data):
+        """brings the object at key up to date with its record data
+
+        A None data removes the object. The object is only rebuilt when
+        the record's updated_at differs from the one last seen for it,
+        and in lazy mode the record is kept pending until first accessed.
+        """
+        if data is None:
+            self.__stamps.pop(key, None)
+            self.__drop(key)
+            return
+        stamp = self.__text(data.get("updated_at"))
+        if not self.__exists(key) or self.__stamps.get(key) != stamp:
+            if data.get("__class__") not in classes or \
+                    key.partition(".")[0] != data["__class__"]:
+                return
+            if not self.__lazy:
+                data = classes[data["__class__"]](**data)
+                # the object is as stored
+                data._dirty = False
+            self.__put(key, data)
+        self.__stamps[key] = stamp
+
+    def reload(self, progress=None):
+        """deserializes the JSON file to __objects
+
+        A file up to HBNB_FILE_STREAM_SIZE bytes is read and checked in
+        a single pass, a larger one is checked first then parsed one
+        record at a time, so that only the record being applied is held
+        besides the objects, whichever its format, JSON or binary. In
+        journaled mode the log is replayed over the
+        JSON file. Only the objects whose record changed since they were
+        last read or written are rebuilt, and objects another writer
+        removed from the file are dropped. Changes not saved yet are kept
+        over those of the file. A file that fails its checksum
+        is read again a few times, then left alone with the objects kept
+        as they are.
+
+        The data files of any layout are read, the single file or the
+        shards, oldest first and one at a time, so that no more than one
+        file is held besides the objects; the next save replaces those
+        of another layout than the one set. When a file is torn every
+        time, the files read before it stay applied, and objects are not
+        dropped nor the files taken as read until a later reload reads
+        them all.
+
+        Args:
+            progress (callable): called with the bytes read so far and
+                the size of all the files after every chunk read
+        """
+        with self.__rw.write():
+            FileStorage.__layout = None
+            signature = self.__signature()
+            self.__fork()
+            logged = {}
+            if self.__journal is not None:
+                for key, data in self.__journal.replay():
+                    logged[key] = data
+            seen = set()
+            files = signature[0]
+            total = sum(file[2] for file in files)
+            done = 0
+            for path, ino, size, mtime in files or [(self.__file_path,
+                                                     None, 0, None)]:
+                report = None
+                if progress is not None:
+                    def report(read, file_size, done=done):
+                        """reports the bytes read out of all the files"""
+                        progress(done + read, max(total, done + file_size))
+                if not self.__read_file(path, logged, seen, report):
+                    # torn every time: keep the objects as they are
+                    return
+                done += size
+            FileStorage.__relayout = not all(self.__in_layout(file[0])
+                                             for file in files)
+            for key, data in logged.items():
+                if data is None:
+                    seen.discard(key)
+                else:
+                    seen.add(key)
+                if key not in self.__changes:
+                    self.__apply(key, data)
+            for key in list(self.__stamps):
+                if key not in seen and key not in self.__changes:
+                    self.__apply(key, None)
+            FileStorage.__synced = signature
+
+    def __read_file(self, path, logged, seen, progress=None):
+        """reads the data file at path as __read does, again a few times
+        while it fails its checksum
+
+        Any other error is not retried. Both are logged.
+
+        Return:
+            False when the file was torn every time or could not be
+            read, True otherwise, even when there is no file
+        """
+        for attempt in range(self.__read_retries + 1):
+            if attempt:
+                # the writer may publish a whole file meanwhile
+                sleep(0.05 * attempt)
+            try:
+                with open(path, 'rb') as f:
+                    records = self.__records(f, progress)
+                    if records is None:
+                        continue
+                    self.__read(records, logged, seen)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.exception("Reading %s failed, the objects are kept "
+                                 "as they are", path)
+                return False
+            return True
+        logger.error("%s failed its checksum %d times, the objects are "
+                     "kept as they are", path, self.__read_retries + 1)
+        return False
+
+    def __records(self, f, progress=None):
+        """returns the (key, data) records of the data file f, read whole
+        or streamed by its size, or None when it fails its checksum"""
+        size = os.fstat(f.fileno()).st_size
+        report = None
+        if progress is not None:
+            def report(done):
+                """reports the bytes read out of the file size"""
+                progress(done, size)
+        if size <= self.__stream_size:
+            return snapshot.read_whole(f, progress=report)
+        if snapshot.verify(f) is False:
+            return None
+        read = snapshot.formats["json"][0]
+        if snapshot.is_binary(f):
+            read = snapshot.formats["binary"][0]
+        return read(f, progress=report)
+
+    def __read(self, records, logged, seen):
+        """applies the (key, data) records not in the logged ones nor
+        changed since the last save, adding their keys to seen"""
+        for key, data in records:
+            seen.add(key)
+            if key not in logged and key not in self.__changes:
+                self.__apply(key, data)
 
     def delete(self, obj=None):
         """delete obj from __objects if it’s inside"""
         if obj is not None:
             key = obj.__class__.__name__ + '.' + obj.id
-            if key in self.__objects:
-                del self.__objects[key]
+            with self.__rw.write():
+                if self.__drop(key) is not None:
+                    self.__changes[key] = None
+
+    def search_places(self, states=None, cities=None, amenities=None,
+                      after=None, limit=None, load=None):
+        """returns the places in the given states or cities
+
+        Places of every listed state and city are gathered from the
+        reverse indexes. Only when that gives nothing are the places
+        having all the listed amenities returned instead, and with no
+        filter at all every place is. Places come ordered by
+        (created_at, id), starting after the after pair, limit at most.
+        Ids that are not strings match nothing. load is ignored, as in
+        all().
+        """
+        with self.__reading(Place):
+            self.__partitioned()
+            place_keys = set()
+            city_ids = [city_id for city_id in cities or ()
+                        if isinstance(city_id, str) and
+                        self.__exists("City." + city_id)]
+            cities_index = self.__references.get(("City", "state_id"), {})
+            for state_id in states or ():
+                if isinstance(state_id, str) and \
+                        self.__exists("State." + state_id):
+                    city_ids.extend(key.partition(".")[2] for key in
+                                    cities_index.get(state_id, ()))
+            index = self.__references.get(("Place", "city_id"), {})
+            for city_id in city_ids:
+                place_keys.update(index.get(city_id, ()))
+            if place_keys:
+                found = [self.__resolve(key) for key in place_keys]
+            elif amenities:
+                found = self.places_with_amenities(amenities)
+            elif states or cities:
+                found = []
+            else:
+                found = self.all(Place).values()
+            return self.__page(found, after, limit)
+
+    def places_with_amenities(self, ids):
+        """returns the places having all the amenities of the ids list
+
+        The sets of place keys indexed for each amenity are intersected,
+        smallest first. An unknown amenity id, or one that is not a
+        string, matches no place.
+        """
+        with self.__reading(Place):
+            self.__partitioned()
+            place_keys = []
+            for amenity_id in ids:
+                if not isinstance(amenity_id, str) or \
+                        not self.__exists("Amenity." + amenity_id):
+                    return []
+                place_keys.append(self.__amenity_places.get(amenity_id, set()))
+            if not place_keys:
+                return []
+            place_keys.sort(key=len)
+            found = place_keys[0].intersection(*place_keys[1:])
+            return [self.__resolve(key) for key in found]
+
+    def amenity_facets(self, place_ids):
+        """returns how many of the places of place_ids have each amenity
+
+        Return:
+            dictionary of the counts by amenity id, for amenities of at
+            least one of the places
+        """
+        with self.__rw.read():
+            self.__partitioned()
+            place_keys = {"Place." + place_id for place_id in place_ids
+                          if isinstance(place_id, str)}
+            facets = {}
+            for amenity_id, keys in self.__amenity_places.items():
+                count = len(place_keys.intersection(keys))
+                if count and self.__exists("Amenity." + amenity_id):
+                    facets[amenity_id] = count
+            return facets
+
+    def page(self, cls, where=None, after=None, limit=None, load=None):
+        """returns one page of the objects of cls ordered by (created_at, id)
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): attribute values the objects must have
+            after (tuple): the (created_at, id) the page starts after
+            limit (int): the page size, None for no limit
+            load (dict): ignored, as in all()
+        """
+        with self.__reading(cls):
+            name = cls if isinstance(cls, str) else cls.__name__
+            if name not in classes:
+                return []
+            if where:
+                return self.__page(self.query(name, where), after, limit)
+            ordered = self.__ordered_of(name)
+            start = 0
+            if after is not None:
+                start = bisect_right(ordered,
+                                     (after[0].strftime(time), after[1]))
+            end = None if limit is None else start + limit
+            return [self.__resolve(name + "." + id)
+                    for _, id in ordered[start:end]]
+
+    def __ordered_of(self, name):
+        """returns the sorted list of the (created_at, id) of class name,
+        built if need be"""
+        ordered = self.__ordered.get(name)
+        if ordered is None:
+            ordered = sorted(self.__sort_key(item) for item in
+                             chain(self.__partition(name).values(),
+                                   self.__pending_records(name).values()))
+            self.__ordered[name] = ordered
+        return ordered
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=None,
+              load=None):
+        """returns the objects of cls meeting the conditions of where
+
+        Conditions, ordering and window are as models.engine.criteria
+        describes them. A condition of a foreign key equal to a value, or
+        in a list of them, takes the candidates from its reverse index,
+        still checked against every condition; otherwise every object of
+        the class is checked. In the default
+        order and with no condition, only the objects of the window are
+        built, from the sorted list of the class.
 
-    def get(self, cls, id):
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): the conditions by attribute
+            order_by (str or list): the attributes to order by
+            limit (int): the number of objects at most, None for all
+            offset (int): the number of objects to skip first
+            load (dict): ignored, as in all()
+        """
+        with self.__reading(cls):
+            name = cls if isinstance(cls, str) else cls.__name__
+            if name not in classes:
+                return []
+            conditions = criteria.conditions(where)
+            order = criteria.ordering(order_by)
+            if not conditions and order == criteria.default_order:
+                return [self.__resolve(name + "." + id) for _, id in
+                        criteria.window(self.__ordered_of(name), limit,
+                                        offset)]
+            objs = None
+            for attr, op, value in conditions:
+                if attr in self.__foreign_keys.get(name, ()) and \
+                        op in ("==", "in"):
+                    self.__partitioned()
+                    index = self.__references.get((name, attr), {})
+                    keys = {}
+                    for wanted in value if op == "in" else [value]:
+                        keys.update(index.get(wanted, {}))
+                    objs = [self.__resolve(key) for key in keys]
+                    break
+            if objs is None:
+                objs = self.all(name).values()
+            objs = [obj for obj in objs if criteria.matches(obj, conditions)]
+            return criteria.window(criteria.sort(objs, order), limit, offset)
+
+    def __page(self, objs, after=None, limit=None):
+        """returns objs ordered by (created_at, id), after and up to limit"""
+        page = sorted(objs, key=lambda obj: (obj.created_at, obj.id))
+        if after is not None:
+            page = [obj for obj in page if (obj.created_at, obj.id) > after]
+        if limit is not None:
+            page = page[:limit]
+        return page
+
+    def get(self, cls, id, load=None):
         """Retrives one object
         Args:
+            cls (class or str): The class of the object, or its name
             id (uuid4): The class object identifier
+            load (dict): ignored, as in all()
         """
         if cls and id:
-            if cls in classes.values():
-                class_obj = self.all(cls)
-                for item in class_obj.values():
-                    if item.id == id:
-                        return item
+            name = cls if isinstance(cls, str) else cls.__name__
+            if name in classes and isinstance(id, str):
+                key = name + "." + id
+                with self.__reading(key=key):
+                    return self.__resolve(key)
             return
         return
 
-    def count(self, cls):
+    def get_many(self, cls, ids, load=None):
+        """Retrieves the objects of cls whose ids are listed, each probed
+        by its key
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            ids (iterable): The object identifiers
+            load (dict): ignored, as in all()
+
+        Return:
+            dictionary of the objects found by id
+        """
+        with self.__reading(cls):
+            name = cls if isinstance(cls, str) else cls.__name__
+            if name not in classes:
+                return {}
+            found = {}
+            for id in ids:
+                if isinstance(id, str):
+                    obj = self.__resolve(name + "." + id)
+                    if obj is not None:
+                        found[id] = obj
+            return found
+
+    def count(self, cls=None):
         """Counts object occurrances
+
+        Takes the size of the class partition instead of scanning, and
+        counts pending records without building them.
         """
-        if cls:
-            if cls in classes.values():
-                return len(self.all(cls))
-            return
-        return len(self.all())
+        with self.__rw.read():
+            if cls:
+                if cls in classes.values() or cls in classes:
+                    name = cls if isinstance(cls, str) else cls.__name__
+                    return len(self.__partition(name)) + \
+                        len(self.__pending_records(name))
+                return
+            return sum(self.counts().values())
+
+    def counts(self):
+        """Counts the objects of every class from the partition sizes
+
+        Return:
+            dictionary of the counts by class name
+        """
+        with self.__rw.read():
+            partitions = self.__partitioned()
+            return {name: len(partitions.get(name, ())) +
+                    len(self.__pending.get(name, ())) for name in classes}
 
     def close(self):
-        """call reload() method for deserializing the JSON file to objects"""
-        self.reload()
+        """call reload() method for deserializing the JSON file to objects
+
+        Nothing is read when the files did not change since they were last
+        read or written, as told by their generation number and stat, and
+        in journaled mode only the records appended to an unchanged JSON
+        file are applied. Changes not saved yet are kept.
+        """
+        signature = self.__signature()
+        if signature == self.__synced:
+            return
+        with self.__rw.write():
+            synced = self.__synced
+            if signature == synced:
+                return
+            self.__fork()
+            if self.__journal is not None and synced is not None and \
+                    signature[0] == synced[0] and \
+                    signature[1] is not None and synced[1] is not None and \
+                    signature[1][0] == synced[1][0]:
+                for key, data in self.__journal.tail():
+                    if key not in self.__changes:
+                        self.__apply(key, data)
+                FileStorage.__synced = signature
+                return
+            self.reload()
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""
+Contains the Journal class
+"""
+
+import json
+import os
+
+
+class Journal:
+    """append-only log of changes made to the objects of a FileStorage
+
+    Every record is one JSON line: {"op": "put", "key": ..., "data": ...}
+    for a created/updated object and {"op": "del", "key": ...} for a
+    deleted one. Replaying the log over the last snapshot gives back the
+    current state. A compaction rotates the live segment aside so that
+    writers keep appending to a fresh one while the snapshot is rebuilt.
+    """
+
+    def __init__(self, path):
+        """Instantiate a Journal writing to path"""
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.records = 0
+        # byte offset in the live segment up to which records were read
+        self.offset = 0
+
+    def append(self, changes, sync=False):
+        """appends one record per (key, data) pair, data None for deletes
+
+        With sync, the records are flushed to disk before returning.
+        """
+        lines = []
+        for key, data in changes:
+            if data is None:
+                record = {"op": "del", "key": key}
+            else:
+                record = {"op": "put", "key": key, "data": data}
+            lines.append(json.dumps(record) + "\n")
+        if not lines:
+            return
+        with open(self.path, 'a+b') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # terminate a record torn by a crash
+                    lines.insert(0, "\n")
+            f.write("".join(lines).encode())
+            self.offset = f.tell()
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.records += len(lines)
+
+    def replay(self):
+        """yields (key, data) for every record, rotated segment first"""
+        self.records = 0
+        for record in self.__read(self.rotated_path, 0):
+            yield record
+        self.offset = 0
+        for record in self.tail():
+            yield record
+
+    def tail(self):
+        """yields (key, data) for the records appended since the last read"""
+        for record in self.__read(self.path, self.offset):
+            yield record
+
+    def __read(self, path, offset):
+        """yields (key, data) for the records of path starting at offset"""
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # still being appended, or torn by a crash
+                    break
+                if path == self.path:
+                    self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn record of an interrupted append
+                    continue
+                self.records += 1
+                yield record["key"], record.get("data")
+
+    def rotate(self):
+        """moves the live segment aside so a snapshot can absorb it"""
+        if not os.path.exists(self.path):
+            return
+        if os.path.exists(self.rotated_path):
+            # left behind by an interrupted compaction: fold both together
+            with open(self.path, 'rb') as src:
+                with open(self.rotated_path, 'ab') as dst:
+                    dst.write(b"\n" + src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self.records = 0
+        self.offset = 0
+
+    def discard_rotated(self):
+        """removes the rotated segment once it is folded into a snapshot"""
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,418 @@
+#!/usr/bin/python3
+"""
+Contains the MappedStorage class
+"""
+
+import io
+import mmap
+from models.amenity import Amenity
+from models.base_model import BaseModel
+from models.city import City
+from models.engine import criteria, snapshot
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+import os
+import struct
+
+classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
+           "Place": Place, "Review": Review, "State": State, "User": User}
+
+
+class MappedStorage:
+    """serves the objects of an indexed binary snapshot, read-only
+
+    The snapshot a FileStorage writes with HBNB_FILE_FORMAT=binary is
+    memory-mapped, and records are decoded straight from the mapping when
+    they are read. Every process mapping the same file shares its pages
+    through the OS page cache; only the positions of the index, and
+    those of the records by the values of the attributes they were
+    looked up by, are kept on the heap. Writes are left to the single
+    FileStorage writer, whose next snapshot is mapped by close() once it
+    replaced the file.
+    """
+
+    # string - path to the binary snapshot
+    __file_path = os.getenv("HBNB_MMAP_FILE", "file.hbnb")
+    # memoryview - the mapped snapshot, None when there is none
+    __view = None
+    # dictionary - (number of records, position of the offsets by id,
+    # position of the offsets by (created_at, id)) by class name
+    __index = {}
+    # tuple - (inode, size, mtime) of the snapshot as mapped
+    __synced = None
+    # dictionary - (mapped view, position of the offsets by (created_at,
+    # id), positions of the records by value) of the records of a class
+    # by (class name, attribute), decoded the first time they are
+    # looked up by that attribute
+    __lookups = {}
+
+    def all(self, cls=None, load=None):
+        """returns a dictionary of the objects, of cls only if given
+
+        load, the relationships DBStorage would load along, is ignored.
+        """
+        new_dict = {}
+        for name in self.__index:
+            if cls is None or cls is classes.get(name) or cls == name:
+                for obj in self.__scan(name):
+                    new_dict[name + "." + obj.id] = obj
+        return new_dict
+
+    def new(self, obj):
+        """refuses to add obj, the storage is read-only"""
+        raise io.UnsupportedOperation("read-only storage")
+
+    def save(self):
+        """refuses to save, the storage is read-only"""
+        raise io.UnsupportedOperation("read-only storage")
+
+    def delete(self, obj=None):
+        """refuses to delete obj, the storage is read-only"""
+        raise io.UnsupportedOperation("read-only storage")
+
+    def reload(self):
+        """maps the snapshot file and reads its index
+
+        A missing or empty file maps to an empty storage. A snapshot
+        without an index or failing its CRC-32 is not mapped and the
+        previous one is kept.
+        """
+        try:
+            with open(self.__file_path, 'rb') as f:
+                signature = self.__stat(os.fstat(f.fileno()))
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            signature = None
+            mapped = None
+        except ValueError:
+            # an empty file cannot be mapped
+            mapped = None
+        if mapped is None:
+            MappedStorage.__view = None
+            MappedStorage.__index = {}
+            MappedStorage.__lookups = {}
+            MappedStorage.__synced = signature
+            return
+        view = memoryview(mapped)
+        try:
+            index = snapshot.read_index(view)
+        except (struct.error, IndexError, UnicodeDecodeError):
+            index = None
+        if index is None:
+            return
+        # objects already built hold copies, so the previous mapping is
+        # simply left to be collected
+        MappedStorage.__view = view
+        MappedStorage.__index = index
+        MappedStorage.__lookups = {}
+        MappedStorage.__synced = signature
+
+    @staticmethod
+    def __stat(st):
+        """returns the (inode, size, mtime) signature of a stat result"""
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def __build(self, name, record):
+        """returns the object of cls name decoded from a mapped record"""
+        key, data = snapshot.decode_record(name, record)
+        return classes[name](**data)
+
+    def __scan(self, name):
+        """yields every object of class name, by (created_at, id)"""
+        entry = self.__index.get(name)
+        if entry is None:
+            return
+        view = self.__view
+        count, by_id, by_created = entry
+        for i in range(count):
+            yield self.__build(name, snapshot.record_at(view, by_created, i))
+
+    def __search(self, at, count, target, key, lo=0):
+        """returns the first of the count sorted offsets at position at
+        whose record key is not below target, by binary search from lo"""
+        view = self.__view
+        hi = count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(snapshot.record_at(view, at, mid)) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def __created_key(record):
+        """returns the (created_at, id) sort key of a mapped record"""
+        id, created_at = snapshot.record_head(record)
+        return (-1 << 63 if created_at is None else created_at, id)
+
+    def get(self, cls, id, load=None):
+        """Retrives one object
+        Args:
+            cls (class or str): The class of the object, or its name
+            id (uuid4): The class object identifier
+            load (dict): ignored, as in all()
+        """
+        if cls and id:
+            name = cls if isinstance(cls, str) else cls.__name__
+            entry = self.__index.get(name)
+            if name not in classes or entry is None or \
+                    not isinstance(id, str):
+                return
+            count, by_id, by_created = entry
+            i = self.__search(by_id, count, id,
+                              lambda record: snapshot.record_head(record)[0])
+            if i < count:
+                record = snapshot.record_at(self.__view, by_id, i)
+                if snapshot.record_head(record)[0] == id:
+                    return self.__build(name, record)
+            return
+        return
+
+    def get_many(self, cls, ids, load=None):
+        """Retrieves the objects of cls whose ids are listed
+
+        The ids are looked up in sorted order, each binary search of the
+        index starting where the previous one ended.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            ids (iterable): The object identifiers
+            load (dict): ignored, as in all()
+
+        Return:
+            dictionary of the objects found by id
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        entry = self.__index.get(name)
+        if name not in classes or entry is None:
+            return {}
+        count, by_id, by_created = entry
+        found = {}
+        i = 0
+        for id in sorted({id for id in ids if isinstance(id, str)}):
+            i = self.__search(by_id, count, id,
+                              lambda record: snapshot.record_head(record)[0],
+                              i)
+            if i == count:
+                break
+            record = snapshot.record_at(self.__view, by_id, i)
+            if snapshot.record_head(record)[0] == id:
+                found[id] = self.__build(name, record)
+        return found
+
+    def count(self, cls=None):
+        """Counts object occurrances, from the index"""
+        if cls:
+            if cls in classes.values() or cls in classes:
+                name = cls if isinstance(cls, str) else cls.__name__
+                return self.__index.get(name, (0,))[0]
+            return
+        return sum(entry[0] for entry in self.__index.values())
+
+    def counts(self):
+        """Counts the objects of every class from the index
+
+        Return:
+            dictionary of the counts by class name
+        """
+        return {name: self.__index.get(name, (0,))[0] for name in classes}
+
+    def page(self, cls, where=None, after=None, limit=None, load=None):
+        """returns one page of the objects of cls ordered by (created_at, id)
+
+        Without where, the page is found by a binary search of the index
+        and only its records are decoded.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): attribute values the objects must have
+            after (tuple): the (created_at, id) the page starts after
+            limit (int): the page size, None for no limit
+            load (dict): ignored, as in all()
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in classes:
+            return []
+        if where:
+            return self.__page(self.query(name, where), after, limit)
+        entry = self.__index.get(name)
+        if entry is None:
+            return []
+        count, by_id, by_created = entry
+        start = 0
+        if after is not None:
+            # the first record above (created_at, id) + the smallest step
+            target = (snapshot.to_micros(after[0]), after[1] + "\0")
+            start = self.__search(by_created, count, target,
+                                  self.__created_key)
+        return self.__slice(name, start, limit)
+
+    def __slice(self, name, start, limit=None):
+        """returns the limit objects of class name from position start of
+        the (created_at, id) order, all the rest without a limit"""
+        entry = self.__index.get(name)
+        if entry is None:
+            return []
+        count, by_id, by_created = entry
+        start = min(start, count)
+        end = count if limit is None else min(count, start + limit)
+        return [self.__build(name, snapshot.record_at(self.__view,
+                                                      by_created, i))
+                for i in range(start, end)]
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=None,
+              load=None):
+        """returns the objects of cls meeting the conditions of where
+
+        Conditions, ordering and window are as models.engine.criteria
+        describes them. The records are decoded and checked one by one,
+        except in the default order with no condition, where only those
+        of the window are decoded, found from the index.
+
+        Args:
+            cls (class or str): The class of the objects, or its name
+            where (dict): the conditions by attribute
+            order_by (str or list): the attributes to order by
+            limit (int): the number of objects at most, None for all
+            offset (int): the number of objects to skip first
+            load (dict): ignored, as in all()
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in classes:
+            return []
+        conditions = criteria.conditions(where)
+        order = criteria.ordering(order_by)
+        if not conditions and order == criteria.default_order:
+            return self.__slice(name, offset or 0, limit)
+        objs = [obj for obj in self.__scan(name)
+                if criteria.matches(obj, conditions)]
+        return criteria.window(criteria.sort(objs, order), limit, offset)
+
+    def __page(self, objs, after=None, limit=None):
+        """returns objs ordered by (created_at, id), after and up to limit"""
+        page = sorted(objs, key=lambda obj: (obj.created_at, obj.id))
+        if after is not None:
+            page = [obj for obj in page if (obj.created_at, obj.id) > after]
+        if limit is not None:
+            page = page[:limit]
+        return page
+
+    def __lookup(self, name, attr):
+        """returns the (mapped view, position of the offsets by
+        (created_at, id), positions of the records by value of attr) of
+        class name, or None when a value of attr cannot be a key
+
+        The records are decoded once per mapping, without building the
+        objects, and the positions kept in __lookups.
+        """
+        view = self.__view
+        cached = self.__lookups.get((name, attr))
+        if cached is not None and cached[0] is view:
+            return cached
+        entry = self.__index.get(name)
+        if entry is None:
+            return None
+        count, by_id, by_created = entry
+        default = getattr(classes[name], attr, None)
+        positions = {}
+        for i in range(count):
+            key, data = snapshot.decode_record(
+                name, snapshot.record_at(view, by_created, i))
+            try:
+                positions.setdefault(data.get(attr, default), []).append(i)
+            except TypeError:
+                return None
+        cached = (view, by_created, positions)
+        self.__lookups[(name, attr)] = cached
+        return cached
+
+    def referencing(self, cls, attr, value):
+        """returns the list of objects of cls whose attribute attr is value
+
+        Only the matching records are decoded, found by the positions of
+        the records by their value of attr, which are decoded the first
+        time cls is looked up by attr. Values that cannot be keys are
+        scanned for.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name not in classes:
+            return []
+        cached = self.__lookup(name, attr)
+        if cached is None:
+            return [obj for obj in self.__scan(name)
+                    if getattr(obj, attr, None) == value]
+        view, by_created, positions = cached
+        try:
+            found = positions.get(value, ())
+        except TypeError:
+            # no key equals a value that cannot be one
+            return []
+        return [self.__build(name, snapshot.record_at(view, by_created, i))
+                for i in found]
+
+    def search_places(self, states=None, cities=None, amenities=None,
+                      after=None, limit=None, load=None):
+        """returns the places in the given states or cities
+
+        Only when that gives nothing are the places having all the listed
+        amenities returned instead, and with no filter at all every place
+        is, ordered by (created_at, id) as in FileStorage. load is
+        ignored, as in all().
+        """
+        city_ids = set(self.get_many(City, cities or ()))
+        for state_id in self.get_many(State, states or ()):
+            city_ids.update(city.id for city in
+                            self.referencing(City, "state_id", state_id))
+        found = []
+        for city_id in city_ids:
+            found.extend(self.referencing(Place, "city_id", city_id))
+        if found:
+            return self.__page(found, after, limit)
+        if amenities:
+            return self.__page(self.places_with_amenities(amenities),
+                               after, limit)
+        if states or cities:
+            return []
+        return self.page(Place, after=after, limit=limit)
+
+    def places_with_amenities(self, ids):
+        """returns the places having all the amenities of the ids list
+
+        An unknown amenity id, or one that is not a string, matches no
+        place.
+        """
+        ids = list(ids)
+        if not all(isinstance(id, str) for id in ids):
+            return []
+        ids = set(ids)
+        if not ids or len(self.get_many(Amenity, ids)) != len(ids):
+            return []
+        return [place for place in self.__scan("Place")
+                if ids.issubset(place.amenity_ids)]
+
+    def amenity_facets(self, place_ids):
+        """returns how many of the places of place_ids have each amenity
+
+        Return:
+            dictionary of the counts by amenity id, for amenities of at
+            least one of the places
+        """
+        facets = {}
+        for place in self.get_many(Place, place_ids).values():
+            for amenity_id in set(place.amenity_ids):
+                facets[amenity_id] = facets.get(amenity_id, 0) + 1
+        known = self.get_many(Amenity, facets)
+        return {amenity_id: count for amenity_id, count in facets.items()
+                if amenity_id in known}
+
+    def close(self):
+        """maps the snapshot again if the writer replaced it"""
+        try:
+            signature = self.__stat(os.stat(self.__file_path))
+        except OSError:
+            signature = None
+        if signature != self.__synced:
+            self.reload()
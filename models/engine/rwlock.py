@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+Contains the ReadWriteLock class
+"""
+
+from contextlib import contextmanager
+import threading
+
+
+class ReadWriteLock:
+    """lock held by any number of readers at once, or by a single writer
+
+    Writers are preferred: once one waits, new readers wait behind it,
+    but the readers waiting when a writer releases the lock go before the
+    next writer, so a steady stream of writers cannot starve them.
+    A thread may take the lock again while it holds it, for reading, or
+    for writing if it holds it for writing; a reader cannot upgrade.
+    """
+
+    def __init__(self):
+        """Instantiate a ReadWriteLock"""
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = 0
+        self.__writer = None
+        self.__waiting = 0
+        self.__queued = 0
+        self.__admitted = 0
+        self.__local = threading.local()
+
+    @contextmanager
+    def read(self):
+        """holds the lock for reading for the duration of the block"""
+        me = threading.get_ident()
+        depth = getattr(self.__local, "reads", 0)
+        if depth or self.__writer == me:
+            # already held: waiting for a writer here would deadlock
+            self.__local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self.__local.reads = depth
+            return
+        with self.__cond:
+            self.__queued += 1
+            try:
+                while self.__writer is not None or \
+                        (self.__waiting and not self.__admitted):
+                    self.__cond.wait()
+            finally:
+                self.__queued -= 1
+            if self.__admitted:
+                self.__admitted -= 1
+            self.__readers += 1
+        self.__local.reads = 1
+        try:
+            yield
+        finally:
+            self.__local.reads = 0
+            with self.__cond:
+                self.__readers -= 1
+                if not self.__readers:
+                    self.__cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """holds the lock alone for the duration of the block"""
+        me = threading.get_ident()
+        if self.__writer == me:
+            yield
+            return
+        if getattr(self.__local, "reads", 0):
+            raise RuntimeError("cannot upgrade a read lock to a write lock")
+        with self.__cond:
+            self.__waiting += 1
+            try:
+                while self.__writer is not None or self.__readers or \
+                        self.__admitted:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__writer = me
+        try:
+            yield
+        finally:
+            with self.__cond:
+                self.__writer = None
+                # the readers waiting now go in before the next writer
+                self.__admitted = self.__queued
+                self.__cond.notify_all()
@@ -0,0 +1,614 @@
+#!/usr/bin/python3
+"""
+Contains the functions streaming the records of a snapshot, in JSON or
+in the compact binary format
+"""
+
+import codecs
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import re
+import struct
+import zlib
+
+# number of bytes read from the snapshot at a time
+chunk_size = int(os.getenv("HBNB_FILE_CHUNK_SIZE", 1 << 16))
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+time = "%Y-%m-%dT%H:%M:%S.%f"
+# The JSON snapshot starts with a fixed-width "__meta__" member holding
+# the CRC-32 and the size of the bytes that follow it, so that a reader
+# can tell a torn or damaged file from a whole one.
+_meta = '{{"__meta__": {{"crc32": "{:08x}", "size": "{:016d}"}}'
+meta_size = len(_meta.format(0, 0))
+_meta_re = re.compile(rb'{"__meta__": {"crc32": "([0-9a-f]{8})", '
+                      rb'"size": "([0-9]{16})"}')
+
+
+def read_records(f, chunk_size=chunk_size, progress=None):
+    """yields (key, data) for every member of the JSON object in file f
+
+    The file is read chunk_size bytes at a time and decoded one member
+    at a time, so only the record being yielded is held in memory, not
+    the whole document. progress, if given, is called with the number of
+    bytes read so far after every chunk.
+
+    Raises:
+        ValueError: the file is not a JSON object
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buf = ""
+    pos = 0
+    done = 0
+    eof = False
+
+    def more():
+        """appends the next chunk to buf, returns False at end of file"""
+        nonlocal buf, pos, done, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        done += len(chunk)
+        # drop what was already decoded before growing the buffer
+        buf = buf[pos:] + decode(chunk, final=eof)
+        pos = 0
+        if progress is not None and chunk:
+            progress(done)
+        return bool(chunk) or bool(buf)
+
+    def skip():
+        """moves pos to the next non-blank character, returns it or ''"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _whitespace:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ""
+
+    def value():
+        """decodes the JSON value at pos, reading more until it is whole"""
+        nonlocal pos
+        while True:
+            try:
+                data, end = _decoder.raw_decode(buf, pos)
+            except ValueError:
+                if not more():
+                    raise
+                continue
+            # a number may go on in the next chunk
+            if end == len(buf) and not eof:
+                more()
+                continue
+            pos = end
+            return data
+
+    if skip() != "{":
+        raise ValueError("snapshot is not a JSON object")
+    meta = True
+    pos += 1
+    token = skip()
+    if token == "}":
+        return
+    while True:
+        if token != '"':
+            raise ValueError("malformed snapshot member")
+        key = value()
+        if skip() != ":":
+            raise ValueError("malformed snapshot member")
+        pos += 1
+        skip()
+        data = value()
+        if not (meta and key == "__meta__"):
+            yield key, data
+        meta = False
+        token = skip()
+        pos += 1
+        if token == "}":
+            return
+        if token != ",":
+            raise ValueError("malformed snapshot member")
+        token = skip()
+
+
+def write_records(f, items):
+    """writes the (key, data) pairs of items to f as one JSON object
+
+    Records are serialized one at a time instead of building the whole
+    document first.
+    """
+    write_fragments(f, (fragment(key, data) for key, data in items))
+
+
+def fragment(key, data):
+    """returns the bytes of the member of record data in a JSON snapshot"""
+    return b", " + json.dumps(key).encode() + b": " + \
+        json.dumps(data, default=_to_json).encode()
+
+
+def write_fragments(f, fragments):
+    """writes the members serialized by fragment() to f as one JSON object
+
+    The "__meta__" member is written first with blank values, then filled
+    in once the CRC-32 of the rest is known; f must therefore be seekable.
+    """
+    f.write(_meta.format(0, 0).encode())
+    crc = 0
+    size = 0
+    for raw in fragments:
+        crc = zlib.crc32(raw, crc)
+        size += len(raw)
+        f.write(raw)
+    crc = zlib.crc32(b"}", crc)
+    f.write(b"}")
+    end = f.tell()
+    f.seek(end - size - 1 - meta_size)
+    f.write(_meta.format(crc, size + 1).encode())
+    f.seek(end)
+
+
+def verify(f):
+    """checks the JSON snapshot in f against its "__meta__" member, or
+    the binary one against the CRC-32 of its trailer
+
+    Return:
+        True when the snapshot is whole, False when it is torn or
+        damaged, None when it has no checksum to check
+    """
+    if is_binary(f):
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - _trailer_size))
+        trailer = _trailer(f.read())
+        f.seek(0)
+        if trailer is None:
+            return False
+        index_at, crc, trailer_size = trailer
+        if not len(magic) <= index_at < size - trailer_size:
+            return False
+        if crc is None:
+            return None
+        # the CRC-32 covers every byte before it
+        left = size - _u32.size - len(index_magic)
+        actual_crc = 0
+        while left:
+            chunk = f.read(min(chunk_size, left))
+            if not chunk:
+                break
+            actual_crc = zlib.crc32(chunk, actual_crc)
+            left -= len(chunk)
+        f.seek(0)
+        return actual_crc == crc and not left
+    head = f.read(meta_size)
+    if not head.startswith(b'{"__meta__"'):
+        f.seek(0)
+        return None
+    match = _meta_re.fullmatch(head)
+    if match is None:
+        f.seek(0)
+        return False
+    crc = int(match.group(1), 16)
+    size = int(match.group(2))
+    actual_crc = 0
+    actual_size = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        actual_crc = zlib.crc32(chunk, actual_crc)
+        actual_size += len(chunk)
+    f.seek(0)
+    return actual_crc == crc and actual_size == size
+
+
+def read_whole(f, progress=None):
+    """returns the list of the (key, data) records of the snapshot in f,
+    JSON or binary, read at once, or None when it is torn or damaged
+
+    The file is read in a single pass: the checksum is computed over the
+    bytes that are then parsed, so the snapshot costs one read instead of
+    the two of verify() and a streaming reader, at the price of holding
+    the whole file and its records in memory. progress, if given, is
+    called with the size of the file once it is read.
+
+    Raises:
+        ValueError: the file is not a snapshot
+    """
+    raw = f.read()
+    if progress is not None and raw:
+        progress(len(raw))
+    if raw.startswith(magic):
+        if verify(io.BytesIO(raw)) is False:
+            return None
+        return list(read_binary_records(io.BytesIO(raw)))
+    if raw.startswith(b'{"__meta__"'):
+        match = _meta_re.fullmatch(raw[:meta_size])
+        if match is None or \
+                int(match.group(2)) != len(raw) - meta_size or \
+                int(match.group(1), 16) != \
+                zlib.crc32(memoryview(raw)[meta_size:]):
+            return None
+    records = json.loads(raw)
+    if type(records) is not dict:
+        raise ValueError("snapshot is not a JSON object")
+    if next(iter(records), None) == "__meta__":
+        del records["__meta__"]
+    return list(records.items())
+
+
+def _to_json(value):
+    """serializes the datetimes a binary snapshot record may hold"""
+    if isinstance(value, datetime):
+        return value.strftime(time)
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+# The binary format starts with the magic bytes and is followed by one
+# table per class: the class name (u8 length + UTF-8), the number of
+# records (u32) and the records, each prefixed by its length (u32).
+# A record is a flags byte, the id (16 bytes when it is a UUID, else
+# u16 length + UTF-8), created_at and updated_at as microseconds since
+# the epoch (i64, when present), then the number of other attributes
+# (u16) and for each its name (u8 length + UTF-8), a type tag and the
+# value. All integers are little-endian.
+# The tables end with a zero byte and are followed by the index: the
+# number of classes (u16), then for each its name, its number of records
+# (u32) and the offsets (u64) of its records sorted by id, then sorted by
+# (created_at, id). The file ends with the offset of the index (u64),
+# the CRC-32 of all the bytes before it (u32) and the index magic bytes;
+# files ending with the older index magic have no CRC-32.
+magic = b"HBNB\x01"
+index_magic = b"HBIC"
+_unchecked_index_magic = b"HBIX"
+_ID_UUID = 1
+_CREATED_AT = 2
+_UPDATED_AT = 4
+_epoch = datetime(1970, 1, 1)
+_microsecond = timedelta(microseconds=1)
+_u8 = struct.Struct("<B")
+_u16 = struct.Struct("<H")
+_u32 = struct.Struct("<I")
+_i64 = struct.Struct("<q")
+_u64 = struct.Struct("<Q")
+_f64 = struct.Struct("<d")
+_trailer_size = _u64.size + _u32.size + len(index_magic)
+_S, _J, _I, _F, _N, _T, _FALSE = b"sjifntF"
+
+
+def is_binary(f):
+    """tells whether the file f, at its start, is a binary snapshot"""
+    head = f.read(len(magic))
+    f.seek(0)
+    return head == magic
+
+
+def _datetime(value):
+    """returns the datetime of a datetime or its string form"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _encode_value(value):
+    """returns the type tag and bytes of an attribute value"""
+    kind = type(value)
+    if kind is str:
+        raw = value.encode()
+        return b"s" + _u32.pack(len(raw)) + raw
+    if value is None:
+        return b"n"
+    if kind is bool:
+        return b"t" if value else b"F"
+    if kind is int and -(1 << 63) <= value < (1 << 63):
+        return b"i" + _i64.pack(value)
+    if kind is float:
+        return b"f" + _f64.pack(value)
+    raw = json.dumps(value, default=_to_json).encode()
+    return b"j" + _u32.pack(len(raw)) + raw
+
+
+def _uuid_bytes(id):
+    """returns the 16 bytes of an id in the canonical UUID form, or None"""
+    if len(id) != 36 or id[8] != "-" or id[13] != "-" or \
+            id[18] != "-" or id[23] != "-" or not id.islower() and \
+            not id.replace("-", "").isdigit():
+        return None
+    try:
+        raw = bytes.fromhex(id.replace("-", ""))
+    except ValueError:
+        return None
+    return raw if len(raw) == 16 else None
+
+
+def to_micros(value):
+    """returns a datetime, or its string form, in microseconds since the
+    epoch, or None"""
+    if value is None:
+        return None
+    return (_datetime(value) - _epoch) // _microsecond
+
+
+def _encode_record(data):
+    """returns the bytes of one record"""
+    flags = 0
+    parts = []
+    id = data["id"]
+    raw = _uuid_bytes(id) if type(id) is str else None
+    if raw is not None:
+        flags |= _ID_UUID
+        parts.append(raw)
+    else:
+        raw = id.encode()
+        parts.append(_u16.pack(len(raw)) + raw)
+    for flag, name in ((_CREATED_AT, "created_at"),
+                       (_UPDATED_AT, "updated_at")):
+        micros = to_micros(data.get(name))
+        if micros is not None:
+            flags |= flag
+            parts.append(_i64.pack(micros))
+    fields = [(name, value) for name, value in data.items()
+              if name not in ("__class__", "id", "created_at", "updated_at")]
+    parts.append(_u16.pack(len(fields)))
+    for name, value in fields:
+        raw = name.encode()
+        parts.append(_u8.pack(len(raw)) + raw + _encode_value(value))
+    return _u8.pack(flags) + b"".join(parts)
+
+
+def write_binary_records(f, items):
+    """writes the (key, data) pairs of items to f as a binary snapshot
+
+    Consecutive records of the same class go to the same table, so items
+    should come grouped by class.
+    """
+    write_binary_fragments(f, (binary_fragment(key, data)
+                               for key, data in items))
+
+
+def binary_fragment(key, data):
+    """returns the (class name, id, created_at in microseconds or None,
+    bytes) of record data in a binary snapshot"""
+    return (data["__class__"], data["id"], to_micros(data.get("created_at")),
+            _encode_record(data))
+
+
+def write_binary_fragments(f, fragments):
+    """writes the records encoded by binary_fragment() to f as a binary
+    snapshot
+
+    Each table's record count is filled in once the table is written, f
+    must therefore be seekable. The index of the record offsets is
+    written last, from the (id, created_at, offset) of every record kept
+    meanwhile, then the trailer, whose CRC-32 is computed by reading the
+    written bytes back, so f must be readable too.
+    """
+    def close_table():
+        """writes the record count of the current table in its header"""
+        end = f.tell()
+        f.seek(count_at)
+        f.write(_u32.pack(count))
+        f.seek(end)
+
+    f.write(magic)
+    name = None
+    index = {}
+    for record_name, id, created_at, record in fragments:
+        if record_name != name:
+            if name is not None:
+                close_table()
+            name = record_name
+            raw = name.encode()
+            f.write(_u8.pack(len(raw)) + raw)
+            count_at = f.tell()
+            count = 0
+            f.write(_u32.pack(count))
+            entries = index.setdefault(name, [])
+        entries.append((id, created_at, f.tell()))
+        f.write(_u32.pack(len(record)))
+        f.write(record)
+        count += 1
+    if name is not None:
+        close_table()
+    f.write(b"\0")
+    index_at = f.tell()
+    f.write(_u16.pack(len(index)))
+    for name, entries in index.items():
+        raw = name.encode()
+        f.write(_u8.pack(len(raw)) + raw + _u32.pack(len(entries)))
+        entries.sort()
+        f.write(b"".join(_u64.pack(offset) for _, _, offset in entries))
+        entries.sort(key=_created_order)
+        f.write(b"".join(_u64.pack(offset) for _, _, offset in entries))
+    f.write(_u64.pack(index_at))
+    end = f.tell()
+    f.seek(0)
+    crc = 0
+    left = end
+    while left:
+        chunk = f.read(min(chunk_size, left))
+        crc = zlib.crc32(chunk, crc)
+        left -= len(chunk)
+    f.write(_u32.pack(crc) + index_magic)
+
+
+def _created_order(entry):
+    """returns the (created_at, id) sort key of an index entry"""
+    id, created_at, offset = entry
+    return (-1 << 63 if created_at is None else created_at, id)
+
+
+def _trailer(tail):
+    """returns the (offset of the index, CRC-32 or None, size of the
+    trailer) of a binary snapshot ending with the bytes tail, or None
+    when it does not end with an index"""
+    if tail.endswith(index_magic) and len(tail) >= _trailer_size:
+        index_at, = _u64.unpack_from(tail, len(tail) - _trailer_size)
+        crc, = _u32.unpack_from(tail, len(tail) - _trailer_size + 8)
+        return index_at, crc, _trailer_size
+    if tail.endswith(_unchecked_index_magic) and len(tail) >= 12:
+        index_at, = _u64.unpack_from(tail, len(tail) - 12)
+        return index_at, None, 12
+    return None
+
+
+def read_index(buf):
+    """returns the index of the binary snapshot mapped in buf
+
+    Return:
+        dictionary of the (number of records, position of the offsets
+        by id, position of the offsets by (created_at, id)) by class
+        name, or None when the snapshot has no index or fails its CRC-32
+    """
+    if buf[:len(magic)] != magic:
+        return None
+    trailer = _trailer(bytes(buf[-_trailer_size:]))
+    if trailer is None:
+        return None
+    pos, crc, trailer_size = trailer
+    if crc is not None and \
+            zlib.crc32(buf[:len(buf) - _u32.size - len(index_magic)]) != crc:
+        return None
+    classes, = _u16.unpack_from(buf, pos)
+    pos += 2
+    index = {}
+    for i in range(classes):
+        size = buf[pos]
+        name = str(buf[pos + 1:pos + 1 + size], "utf-8")
+        count, = _u32.unpack_from(buf, pos + 1 + size)
+        pos += 1 + size + 4
+        index[name] = (count, pos, pos + 8 * count)
+        pos += 16 * count
+    return index
+
+
+def record_at(buf, at, i):
+    """returns the i-th record of the offsets at position at of buf
+
+    The record is a slice of buf, not a copy when buf is a memoryview.
+    """
+    offset, = _u64.unpack_from(buf, at + 8 * i)
+    size, = _u32.unpack_from(buf, offset)
+    return buf[offset + 4:offset + 4 + size]
+
+
+def record_head(record):
+    """returns the (id, created_at in microseconds or None) of a record"""
+    flags = record[0]
+    if flags & _ID_UUID:
+        raw = record[1:17].hex()
+        id = "-".join((raw[:8], raw[8:12], raw[12:16], raw[16:20], raw[20:]))
+        pos = 17
+    else:
+        size, = _u16.unpack_from(record, 1)
+        id = str(record[3:3 + size], "utf-8")
+        pos = 3 + size
+    created_at = None
+    if flags & _CREATED_AT:
+        created_at, = _i64.unpack_from(record, pos)
+    return id, created_at
+
+
+def decode_record(name, record):
+    """returns the (key, data) of the bytes of one record of class name
+
+    record may be any buffer, such as a slice of a memory mapping.
+    """
+    flags = record[0]
+    pos = 1
+    if flags & _ID_UUID:
+        raw = record[pos:pos + 16].hex()
+        id = "-".join((raw[:8], raw[8:12], raw[12:16], raw[16:20], raw[20:]))
+        pos += 16
+    else:
+        size, = _u16.unpack_from(record, pos)
+        id = str(record[pos + 2:pos + 2 + size], "utf-8")
+        pos += 2 + size
+    data = {"__class__": name, "id": id}
+    for flag, attr in ((_CREATED_AT, "created_at"),
+                       (_UPDATED_AT, "updated_at")):
+        if flags & flag:
+            micros, = _i64.unpack_from(record, pos)
+            data[attr] = _epoch + micros * _microsecond
+            pos += 8
+    count, = _u16.unpack_from(record, pos)
+    pos += 2
+    for i in range(count):
+        size = record[pos]
+        attr = str(record[pos + 1:pos + 1 + size], "utf-8")
+        pos += 1 + size
+        tag = record[pos]
+        pos += 1
+        if tag == _S or tag == _J:
+            size, = _u32.unpack_from(record, pos)
+            value = str(record[pos + 4:pos + 4 + size], "utf-8")
+            pos += 4 + size
+            if tag == _J:
+                value = json.loads(value)
+        elif tag == _I:
+            value, = _i64.unpack_from(record, pos)
+            pos += 8
+        elif tag == _F:
+            value, = _f64.unpack_from(record, pos)
+            pos += 8
+        elif tag == _N:
+            value = None
+        elif tag == _T or tag == _FALSE:
+            value = tag == _T
+        else:
+            raise ValueError("unknown attribute type in snapshot")
+        data[attr] = value
+    return name + "." + id, data
+
+
+def read_binary_records(f, progress=None):
+    """yields (key, data) for every record of the binary snapshot in f
+
+    Records are read one at a time; created_at and updated_at come back
+    as datetimes rather than strings. progress, if given, is called with
+    the number of bytes read so far about every chunk_size bytes.
+
+    Raises:
+        ValueError: the file is not a binary snapshot or is truncated
+    """
+    def read(size):
+        """returns the next size bytes of f"""
+        raw = f.read(size)
+        if len(raw) != size:
+            raise ValueError("truncated snapshot")
+        return raw
+
+    if f.read(len(magic)) != magic:
+        raise ValueError("not a binary snapshot")
+    done = len(magic)
+    reported = 0
+    while True:
+        head = f.read(1)
+        if not head or not head[0]:
+            # end of the file, or of the tables when an index follows
+            if progress is not None and done > reported:
+                progress(done)
+            return
+        name = read(head[0]).decode()
+        count, = _u32.unpack(read(4))
+        done += 1 + head[0] + 4
+        for i in range(count):
+            size, = _u32.unpack(read(4))
+            try:
+                yield decode_record(name, read(size))
+            except (struct.error, IndexError, UnicodeDecodeError) as e:
+                raise ValueError("malformed snapshot record") from e
+            done += 4 + size
+            if progress is not None and done - reported >= chunk_size:
+                reported = done
+                progress(done)
+
+
+# (reader, writer) of every snapshot format by name
+formats = {"json": (read_records, write_records),
+           "binary": (read_binary_records, write_binary_records)}
+# (record serializer, writer of serialized records) of every format
+serializers = {"json": (fragment, write_fragments),
+               "binary": (binary_fragment, write_binary_fragments)}
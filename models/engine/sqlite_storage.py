@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+"""
+Contains the class SQLiteStorage
+"""
+
+from models.engine.db_storage import DBStorage
+from os import getenv
+from sqlalchemy import create_engine, event
+
+
+class SQLiteStorage(DBStorage):
+    """interacts with an embedded SQLite database
+
+    The tables are those DBStorage maps the models to, in a single file
+    (HBNB_SQLITE_FILE, hbnb.db by default) needing no database server.
+    Every connection runs in WAL mode, so readers are not blocked by the
+    writer, with the pragmas of __pragmas. The connection pool is set by
+    the HBNB_MYSQL_POOL_* variables as for MySQL.
+    """
+    # tuple - pragmas run on every new connection
+    __pragmas = ("journal_mode=WAL",
+                 # durable at WAL checkpoints, safe from corruption anyway
+                 "synchronous=NORMAL",
+                 "foreign_keys=ON",
+                 # wait for the writer rather than fail right away
+                 "busy_timeout=5000",
+                 # 64 MiB of page cache, and temporary tables in memory
+                 "cache_size=-65536",
+                 "temp_store=MEMORY",
+                 "mmap_size=268435456")
+
+    def __init__(self):
+        """Instantiate a SQLiteStorage object"""
+        engine = create_engine('sqlite:///{}'.format(
+            getenv('HBNB_SQLITE_FILE', 'hbnb.db')),
+            connect_args={"check_same_thread": False},
+            **self.pool_options())
+        event.listen(engine, "connect", self.__configure)
+        super().__init__(engine)
+
+    def __configure(self, connection, record):
+        """runs the pragmas on a new connection"""
+        cursor = connection.cursor()
+        for pragma in self.__pragmas:
+            cursor.execute("PRAGMA " + pragma)
+        cursor.close()
@@ -34,3 +34,16 @@ class User(BaseModel, Base):
             hashed_password = hasher.hexdigest()
             kwargs['password'] = hashed_password
         super().__init__(*args, **kwargs)
+
+    if models.storage_t != 'db':
+        @property
+        def places(self):
+            """getter for list of place instances owned by the user"""
+            from models.place import Place
+            return models.storage.referencing(Place, "user_id", self.id)
+
+        @property
+        def reviews(self):
+            """getter for list of review instances written by the user"""
+            from models.review import Review
+            return models.storage.referencing(Review, "user_id", self.id)
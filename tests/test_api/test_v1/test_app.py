@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+"""
+Contains the TestAppDocs, TestAppConcurrency and TestAppQueries classes
+"""
+
+from contextlib import contextmanager
+import models
+from models.amenity import Amenity
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+import pep8
+from sqlalchemy import event
+from tests.test_models.test_engine.test_file_storage import \
+    FileStorageFixture
+import threading
+import unittest
+
+
+class TestAppDocs(unittest.TestCase):
+    """Tests to check the style of the API app"""
+
+    def test_pep8_conformance_app(self):
+        """Test that api/v1/app.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['api/v1/app.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_app(self):
+        """Test that tests/test_api/test_v1/test_app.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_api/test_v1/test_app.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestAppConcurrency(FileStorageFixture, unittest.TestCase):
+    """Hammer the API views from many threads at once"""
+
+    path = "test_app_concurrency.json"
+    threads = 8
+    rounds = 10
+
+    def setUp(self):
+        """Point FileStorage at a scratch file holding a few states"""
+        super().setUp()
+        from api.v1.app import app
+        self.app = app
+        self.storage = FileStorage()
+        for i in range(10):
+            self.storage.new(State(name="state" + str(i)))
+        self.storage.save()
+
+    def hammer(self, n, errors, kept):
+        """Create, read, list, update and delete states over the API"""
+        client = self.app.test_client()
+        try:
+            for i in range(self.rounds):
+                r = client.post('/api/v1/states',
+                                json={"name": "t{}-{}".format(n, i)})
+                if r.status_code != 201:
+                    errors.append(("POST", r.status_code))
+                    continue
+                state_id = r.get_json()["id"]
+                for url in ('/api/v1/states/' + state_id,
+                            '/api/v1/states?limit=5', '/api/v1/states',
+                            '/api/v1/stats',
+                            '/api/v1/states/{}/cities'.format(state_id)):
+                    r = client.get(url, buffered=True)
+                    if r.status_code != 200:
+                        errors.append((url, r.status_code))
+                r = client.put('/api/v1/states/' + state_id,
+                               json={"name": "u{}-{}".format(n, i)})
+                if r.status_code != 200:
+                    errors.append(("PUT", r.status_code))
+                if i % 2:
+                    r = client.delete('/api/v1/states/' + state_id)
+                    if r.status_code != 200:
+                        errors.append(("DELETE", r.status_code))
+                else:
+                    kept.append(state_id)
+        except Exception as e:
+            errors.append(e)
+
+    def reload(self, done, errors):
+        """Reload the storage over and over until the clients are done"""
+        try:
+            while not done.wait(0.005):
+                self.storage.reload()
+        except Exception as e:
+            errors.append(e)
+
+    def test_hammer_views(self):
+        """Test that concurrent requests neither fail nor lose writes"""
+        errors = []
+        kept = []
+        done = threading.Event()
+        clients = [threading.Thread(target=self.hammer,
+                                    args=(n, errors, kept))
+                   for n in range(self.threads)]
+        reloader = threading.Thread(target=self.reload, args=(done, errors))
+        reloader.start()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        done.set()
+        reloader.join()
+        self.assertEqual(errors, [])
+        expected = 10 + len(kept)
+        self.assertEqual(len(kept), self.threads * ((self.rounds + 1) // 2))
+        self.assertEqual(self.storage.count(State), expected)
+        self.forget()
+        self.storage.reload()
+        self.assertEqual(self.storage.count(State), expected)
+        for state_id in kept:
+            self.assertEqual(self.storage.get(State, state_id).name[0], "u")
+
+
+@unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+class TestAppQueries(unittest.TestCase):
+    """Count the queries of the views walking relationships, so that
+    their number cannot grow with the number of related rows"""
+
+    # list - the classes of the stored objects, in the order to delete them
+    order = [Review, Place, Amenity, City, State, User]
+
+    def setUp(self):
+        """Store a state with cities, a place with amenities and reviews"""
+        from api.v1.app import app
+        self.client = app.test_client()
+        # start from a session of our own
+        models.storage.close()
+        self.state = State(name="California")
+        self.user = User(email="a@b.c", password="pwd")
+        self.objs = [self.state, self.user]
+        self.amenities = []
+        self.city = self.add_city()
+        self.place = Place(name="Home", city_id=self.city.id,
+                           user_id=self.user.id)
+        self.objs.append(self.place)
+        for obj in self.objs:
+            models.storage.new(obj)
+        models.storage.save()
+        for i in range(2):
+            self.add_related()
+        models.storage.close()
+
+    def tearDown(self):
+        """Delete the stored objects"""
+        models.storage.close()
+        for obj in sorted(self.objs, key=lambda obj: self.order.index(
+                type(obj))):
+            stored = models.storage.get(type(obj), obj.id)
+            if stored is not None:
+                models.storage.delete(stored)
+                models.storage.save()
+        models.storage.close()
+
+    def add_city(self):
+        """stores one more city of the state and returns it"""
+        city = City(name="city" + str(len(self.objs)), state_id=self.state.id)
+        self.objs.append(city)
+        models.storage.new(city)
+        return city
+
+    def add_related(self):
+        """stores one more city, place amenity and review"""
+        models.storage.close()
+        self.add_city()
+        place = models.storage.get(Place, self.place.id)
+        amenity = Amenity(name="amenity" + str(len(self.objs)))
+        review = Review(text="review", place_id=self.place.id,
+                        user_id=self.user.id)
+        self.objs += [amenity, review]
+        self.amenities.append(amenity)
+        models.storage.new(amenity)
+        models.storage.new(review)
+        place.amenities.append(amenity)
+        models.storage.save()
+        models.storage.close()
+
+    @contextmanager
+    def queries(self):
+        """counts the statements run during the block into a list"""
+        engine = models.storage._DBStorage__engine
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            """records statement"""
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+    def request(self, method, url, json=None):
+        """returns the number of queries of the request, which must
+        succeed"""
+        with self.queries() as statements:
+            r = self.client.open(url, method=method, json=json,
+                                 buffered=True)
+        self.assertLess(r.status_code, 300, url)
+        return len(statements)
+
+    def test_views(self):
+        """Test that more related rows take no more queries"""
+        amenity = self.amenities[0]
+        requests = [
+            ("GET", "/api/v1/states/{}/cities".format(self.state.id), None),
+            ("GET", "/api/v1/cities/{}/places".format(self.city.id), None),
+            ("GET", "/api/v1/places/{}/reviews".format(self.place.id), None),
+            ("GET", "/api/v1/places/{}/amenities".format(self.place.id),
+             None),
+            ("POST", "/api/v1/places/{}/amenities/{}".format(
+                self.place.id, amenity.id), None),
+            ("POST", "/api/v1/places_search", {"states": [self.state.id]}),
+            ("POST", "/api/v1/places_search/facets",
+             {"states": [self.state.id]})]
+        before = [self.request(*request) for request in requests]
+        for i in range(3):
+            self.add_related()
+        after = [self.request(*request) for request in requests]
+        self.assertEqual(before, after)
+
+    def test_place_amenities(self):
+        """Test that the amenities of a place come in the same query"""
+        self.assertEqual(self.request("GET", "/api/v1/places/{}/amenities".
+                                      format(self.place.id)), 1)
+
+    def test_all_load(self):
+        """Test that the cities of all the states come in one more query"""
+        for i in range(2):
+            state = State(name="state" + str(i))
+            self.objs.append(state)
+            models.storage.new(state)
+        models.storage.save()
+        models.storage.close()
+        with self.queries() as statements:
+            states = models.storage.all(State, load={"cities": "selectin"})
+            cities = sum(len(state.cities) for state in states.values())
+            self.assertEqual(len(states[State.__name__ + "." +
+                                        self.state.id].to_dict()),
+                             len(self.state.to_dict()))
+        self.assertEqual(cities, 3)
+        self.assertEqual(len(statements), 2)
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""
+Contains the TestPaginationDocs, TestPagination, TestStream and
+TestStreamDB classes
+"""
+
+from base64 import urlsafe_b64encode
+from datetime import datetime
+import json
+import models
+from models.engine.file_storage import FileStorage
+from models.state import State
+import pep8
+import re
+from sqlalchemy import inspect
+from tests.test_models.test_engine.test_file_storage import \
+    FileStorageFixture
+import unittest
+from unittest import mock
+
+
+class TestPaginationDocs(unittest.TestCase):
+    """Tests to check the style of the pagination helpers"""
+
+    def test_pep8_conformance_pagination(self):
+        """Test that api/v1/pagination.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['api/v1/pagination.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_pagination(self):
+        """Test that tests/test_api/test_v1/test_pagination.py conforms to
+        PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_api/test_v1/\
+test_pagination.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestPagination(FileStorageFixture, unittest.TestCase):
+    """Test the limit and cursor of the list endpoints"""
+
+    path = "test_pagination.json"
+
+    def setUp(self):
+        """Store five states created one second apart"""
+        super().setUp()
+        from api.v1.app import app
+        self.client = app.test_client()
+        storage = FileStorage()
+        self.states = [State(name="state" + str(i)) for i in range(5)]
+        for i, state in enumerate(self.states):
+            state.created_at = datetime(2024, 1, 1, 0, 0, i)
+            storage.new(state)
+        storage.save()
+        self.ids = [state.id for state in self.states]
+
+    def get(self, url):
+        """Return the response to a GET of url, which must succeed"""
+        r = self.client.get(url, buffered=True)
+        self.assertEqual(r.status_code, 200, url)
+        return r
+
+    @staticmethod
+    def next_url(r):
+        """Return the URL of the next page a response links to, or None"""
+        match = re.fullmatch(r'<([^>]*)>; rel="next"',
+                             r.headers.get("Link", ""))
+        return match.group(1) if match else None
+
+    def test_limit(self):
+        """Test that limit cuts the list and links to the next page"""
+        r = self.get('/api/v1/states?limit=2')
+        self.assertEqual([state["id"] for state in r.get_json()],
+                         self.ids[:2])
+        self.assertIsNotNone(self.next_url(r))
+        r = self.get('/api/v1/states')
+        self.assertEqual([state["id"] for state in r.get_json()], self.ids)
+        self.assertNotIn("Link", r.headers)
+
+    def test_follow_next(self):
+        """Test that the next links walk every page once, then stop"""
+        url = '/api/v1/states?limit=2'
+        pages = []
+        while url is not None:
+            r = self.get(url)
+            pages.append([state["id"] for state in r.get_json()])
+            url = self.next_url(r)
+        self.assertEqual(pages, [self.ids[:2], self.ids[2:4], self.ids[4:]])
+
+    def test_invalid(self):
+        """Test that a bad limit or a malformed cursor is rejected"""
+        queries = ["limit=0", "limit=-1", "limit=two", "cursor=nope",
+                   "cursor=%%%"] + [
+            "cursor=" + urlsafe_b64encode(text.encode()).decode()
+            for text in ("[1]", "5", '["x", "y"]', "[1, 2]",
+                         '["2024-01-01T00:00:02.000000", 5]',
+                         '["2024-01-01T00:00:02.000000", null]')]
+        for query in queries:
+            r = self.client.get('/api/v1/states?' + query)
+            self.assertEqual(r.status_code, 400, query)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestStream(FileStorageFixture, unittest.TestCase):
+    """Test that list responses are streamed as JSON or NDJSON"""
+
+    path = "test_stream.json"
+
+    def setUp(self):
+        """Store three states created one second apart"""
+        super().setUp()
+        from api.v1.app import app
+        self.client = app.test_client()
+        storage = FileStorage()
+        self.states = [State(name="state" + str(i)) for i in range(3)]
+        for i, state in enumerate(self.states):
+            state.created_at = datetime(2024, 1, 1, 0, 0, i)
+            storage.new(state)
+        storage.save()
+        self.ids = [state.id for state in self.states]
+
+    def test_json_array(self):
+        """Test that the list is streamed as one JSON array"""
+        r = self.client.get('/api/v1/states')
+        self.assertTrue(r.is_streamed)
+        self.assertEqual(r.mimetype, "application/json")
+        self.assertEqual([state["id"] for state in json.loads(r.data)],
+                         self.ids)
+        r = self.client.get('/api/v1/states?limit=1')
+        self.assertEqual(json.loads(r.data)[0]["id"], self.ids[0])
+
+    def test_ndjson(self):
+        """Test that a client accepting NDJSON gets one object per line"""
+        headers = {"Accept": "application/x-ndjson"}
+        r = self.client.get('/api/v1/states', headers=headers)
+        self.assertTrue(r.is_streamed)
+        self.assertEqual(r.mimetype, "application/x-ndjson")
+        lines = r.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines],
+                         self.ids)
+        r = self.client.get('/api/v1/states?limit=2', headers=headers)
+        self.assertEqual(len(r.get_data(as_text=True).splitlines()), 2)
+        self.assertIn('rel="next"', r.headers["Link"])
+
+    def test_query_error_status(self):
+        """Test that a lazy query failing is answered with an error
+        status, not a truncated 200 body"""
+        def rows(*args, **kwargs):
+            """Fail on the first row, as a query run lazily would"""
+            raise RuntimeError("query failed")
+            yield
+
+        with mock.patch.object(models.storage, "page", side_effect=rows):
+            r = self.client.get('/api/v1/states')
+        self.assertEqual(r.status_code, 500)
+
+
+@unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+class TestStreamDB(unittest.TestCase):
+    """Test that a list streamed from the database outlives its view"""
+
+    def setUp(self):
+        """Store more states than DBStorage loads in one batch"""
+        from api.v1.app import app
+        self.client = app.test_client()
+        models.storage.close()
+        count = models.storage._DBStorage__batch_size + 1
+        self.states = [State(name="state" + str(i)) for i in range(count)]
+        for state in self.states:
+            models.storage.new(state)
+        models.storage.save()
+        models.storage.close()
+
+    def tearDown(self):
+        """Delete the stored states"""
+        models.storage.close()
+        for state in models.storage.get_many(
+                State, [state.id for state in self.states]).values():
+            models.storage.delete(state)
+        models.storage.save()
+        models.storage.close()
+
+    def test_stream_outlives_view(self):
+        """Test that the rows are serialized once the view returned, in
+        the request context and session, which close only afterwards"""
+        serialized = []
+        to_dict = State.to_dict
+
+        def record(state):
+            """Serialize state, recording whether its session is open"""
+            serialized.append((close.call_count,
+                               inspect(state).session is not None))
+            return to_dict(state)
+
+        with mock.patch.object(models.storage, "close",
+                               wraps=models.storage.close) as close, \
+                mock.patch.object(State, "to_dict", autospec=True,
+                                  side_effect=record):
+            r = self.client.get('/api/v1/states')
+            self.assertTrue(r.is_streamed)
+            self.assertEqual(serialized, [])
+            ids = {state["id"] for state in json.loads(r.data)}
+            self.assertEqual(close.call_count, 1)
+        self.assertTrue(ids.issuperset(state.id for state in self.states))
+        self.assertEqual(set(serialized), {(0, True)})
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+"""
+Contains the TestPlacesDocs, TestPlacesSearch and TestPlacesSearchDB
+classes
+"""
+
+import models
+from models.amenity import Amenity
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.state import State
+from models.user import User
+import pep8
+from tests.test_models.test_engine.test_file_storage import \
+    FileStorageFixture
+import unittest
+
+
+class TestPlacesDocs(unittest.TestCase):
+    """Tests to check the style of the places views"""
+
+    def test_pep8_conformance_places(self):
+        """Test that api/v1/views/places.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['api/v1/views/places.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_places(self):
+        """Test that tests/test_api/test_v1/test_views/test_places.py
+        conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_api/test_v1/test_views/\
+test_places.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestPlacesSearch(FileStorageFixture, unittest.TestCase):
+    """Test the places_search views over FileStorage"""
+
+    path = "test_places_search.json"
+
+    def setUp(self):
+        """Store a state with a city holding a place with an amenity"""
+        super().setUp()
+        from api.v1.app import app
+        self.client = app.test_client()
+        storage = FileStorage()
+        self.state = State(name="California")
+        self.city = City(name="Fresno", state_id=self.state.id)
+        user = User(email="a@b.c", password="pwd")
+        self.amenity = Amenity(name="Wifi")
+        self.place = Place(name="Home", city_id=self.city.id,
+                           user_id=user.id, amenity_ids=[self.amenity.id])
+        for obj in (self.state, self.city, user, self.amenity, self.place):
+            storage.new(obj)
+        storage.save()
+
+    def search(self, filters, url='/api/v1/places_search'):
+        """Return the JSON response to a search, which must succeed"""
+        r = self.client.post(url, json=filters, buffered=True)
+        self.assertEqual(r.status_code, 200, filters)
+        return r.get_json()
+
+    def test_search(self):
+        """Test that the places of a state are found"""
+        found = self.search({"states": [self.state.id]})
+        self.assertEqual([place["id"] for place in found], [self.place.id])
+
+    def test_ids_not_strings(self):
+        """Test that ids that are not strings match nothing"""
+        self.assertEqual(self.search({"states": [1]}), [])
+        self.assertEqual(self.search({"amenities": [{"id": 1}]}), [])
+        found = self.search({"cities": [None, self.city.id]})
+        self.assertEqual([place["id"] for place in found], [self.place.id])
+        self.assertEqual(self.search({"states": [1], "amenities": [2]},
+                                     '/api/v1/places_search/facets'), {})
+
+
+@unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+class TestPlacesSearchDB(unittest.TestCase):
+    """Test the places_search views over DBStorage"""
+
+    def setUp(self):
+        """Store a state with a city holding a place with an amenity"""
+        from api.v1.app import app
+        self.client = app.test_client()
+        models.storage.close()
+        self.state = State(name="California")
+        self.city = City(name="Fresno", state_id=self.state.id)
+        user = User(email="a@b.c", password="pwd")
+        self.amenity = Amenity(name="Wifi")
+        self.place = Place(name="Home", city_id=self.city.id,
+                           user_id=user.id)
+        self.place.amenities.append(self.amenity)
+        self.objs = [self.state, self.city, user, self.amenity, self.place]
+        for obj in self.objs:
+            models.storage.new(obj)
+        models.storage.save()
+        models.storage.close()
+
+    def tearDown(self):
+        """Delete the stored objects"""
+        models.storage.close()
+        for obj in reversed(self.objs):
+            found = models.storage.get(type(obj), obj.id)
+            if found is not None:
+                models.storage.delete(found)
+                models.storage.save()
+        models.storage.close()
+
+    def search(self, filters, url='/api/v1/places_search'):
+        """Return the JSON response to a search, which must succeed"""
+        r = self.client.post(url, json=filters, buffered=True)
+        self.assertEqual(r.status_code, 200, filters)
+        return r.get_json()
+
+    def test_ids_not_strings(self):
+        """Test that ids that are not strings match nothing"""
+        self.assertEqual(self.search({"states": [{"a": 1}]}), [])
+        self.assertEqual(self.search({"amenities": [{"id": 1}]}), [])
+        self.assertEqual(self.search({"amenities": [[1]]}), [])
+        found = self.search({"cities": [None, self.city.id]})
+        self.assertEqual([place["id"] for place in found], [self.place.id])
+        found = self.search({"states": [1], "cities": [self.city.id]})
+        self.assertEqual([place["id"] for place in found], [self.place.id])
+        self.assertEqual(self.search({"states": [1], "amenities": [2]},
+                                     '/api/v1/places_search/facets'), {})
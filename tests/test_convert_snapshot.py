@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+Contains the TestConvertSnapshotDocs and TestConvertSnapshot classes
+"""
+
+import benchmark_snapshot
+import convert_snapshot
+from contextlib import redirect_stdout
+import io
+from models.engine import snapshot
+from models.place import Place
+from models.state import State
+import os
+import pep8
+import tempfile
+import unittest
+
+
+class TestConvertSnapshotDocs(unittest.TestCase):
+    """Tests to check the documentation and style of the snapshot tools"""
+
+    def test_pep8_conformance_scripts(self):
+        """Test that the snapshot tools conform to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['convert_snapshot.py',
+                                    'benchmark_snapshot.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_convert_snapshot(self):
+        """Test tests/test_convert_snapshot.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_convert_snapshot.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_module_docstrings(self):
+        """Test for the docstrings of the snapshot tools"""
+        for module in (convert_snapshot, benchmark_snapshot):
+            self.assertIsNot(module.__doc__, None,
+                             "{} needs a docstring".format(module.__name__))
+            self.assertTrue(len(module.__doc__) >= 1,
+                            "{} needs a docstring".format(module.__name__))
+
+
+class TestConvertSnapshot(unittest.TestCase):
+    """Test that snapshots are converted between the formats"""
+
+    def setUp(self):
+        """Write a JSON snapshot of a few objects in a scratch directory"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, "file.json")
+        objs = [State(name="California"),
+                Place(name="Home", number_rooms=2, latitude=37.5,
+                      amenity_ids=["a", "b"])]
+        with open(self.source, "w+b") as f:
+            snapshot.write_records(f, [(obj.__class__.__name__ + "." +
+                                        obj.id, obj.to_dict())
+                                       for obj in objs])
+
+    def records(self, path):
+        """Return the records of the snapshot at path by key"""
+        with open(path, "rb") as f:
+            read = snapshot.formats["binary" if snapshot.is_binary(f)
+                                    else "json"][0]
+            return dict(read(f))
+
+    def test_round_trip(self):
+        """Test that JSON converted to binary and back is unchanged"""
+        binary = os.path.join(self.tmp.name, "file.hbnb")
+        back = os.path.join(self.tmp.name, "back.json")
+        self.assertEqual(convert_snapshot.convert(self.source, binary), 2)
+        with open(binary, "rb") as f:
+            self.assertTrue(snapshot.is_binary(f))
+            self.assertTrue(snapshot.verify(f))
+        self.assertEqual(convert_snapshot.convert(binary, back), 2)
+        with open(back, "rb") as f:
+            self.assertTrue(snapshot.verify(f))
+        self.assertEqual(self.records(back), self.records(self.source))
+        self.assertFalse(os.path.exists(binary + ".tmp"))
+
+    def test_benchmark(self):
+        """Test that the benchmark saves and loads every format"""
+        out = io.StringIO()
+        with redirect_stdout(out):
+            benchmark_snapshot.benchmark(self.source, 1)
+        for format in snapshot.formats:
+            self.assertIn(format, out.getvalue())
@@ -131,6 +131,27 @@ class TestBaseModel(unittest.TestCase):
         self.assertTrue(mock_storage.new.called)
         self.assertTrue(mock_storage.save.called)
 
+    def test_dirty(self):
+        """Test that setting an attribute marks the instance dirty"""
+        inst = BaseModel()
+        self.assertTrue(inst._dirty)
+        inst._dirty = False
+        self.assertFalse(inst._dirty)
+        inst.name = "Betty"
+        self.assertTrue(inst._dirty)
+        self.assertNotIn("_dirty", inst.__dict__)
+        self.assertNotIn("_dirty", inst.to_dict())
+
+    def test_init_skips_dirty_hook(self):
+        """Test that building an instance from a dictionary sets its
+        attributes without going through __setattr__"""
+        data = BaseModel(name="Betty").to_dict()
+        with mock.patch.object(BaseModel, "__setattr__") as hook:
+            inst = BaseModel(**data)
+        self.assertEqual(hook.call_count, 0)
+        self.assertEqual(inst.to_dict(), data)
+        self.assertTrue(inst._dirty)
+
 
 class TestBaseModel_to_dict(unittest.TestCase):
     """Tests for BaseModel.to_dict method"""
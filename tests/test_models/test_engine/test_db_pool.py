@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+"""
+Contains the TestMeteredQueuePoolDocs and TestMeteredQueuePool classes
+"""
+
+import inspect
+from models.engine import db_pool
+from models.engine.db_storage import DBStorage
+import os
+import pep8
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+import unittest
+from unittest import mock
+MeteredQueuePool = db_pool.MeteredQueuePool
+
+
+class TestMeteredQueuePoolDocs(unittest.TestCase):
+    """Tests to check the documentation and style of MeteredQueuePool"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        # the methods of QueuePool are not ours to document
+        cls.mp_f = [func for func in inspect.getmembers(MeteredQueuePool,
+                                                        inspect.isfunction)
+                    if func[0] in vars(MeteredQueuePool)]
+
+    def test_pep8_conformance_db_pool(self):
+        """Test that models/engine/db_pool.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/db_pool.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_pep8_conformance_test_db_pool(self):
+        """Test tests/test_models/test_db_pool.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_db_pool.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_db_pool_module_docstring(self):
+        """Test for the db_pool.py module docstring"""
+        self.assertIsNot(db_pool.__doc__, None,
+                         "db_pool.py needs a docstring")
+        self.assertTrue(len(db_pool.__doc__) >= 1,
+                        "db_pool.py needs a docstring")
+
+    def test_db_pool_class_docstring(self):
+        """Test for the MeteredQueuePool class docstring"""
+        self.assertIsNot(MeteredQueuePool.__doc__, None,
+                         "MeteredQueuePool class needs a docstring")
+        self.assertTrue(len(MeteredQueuePool.__doc__) >= 1,
+                        "MeteredQueuePool class needs a docstring")
+
+    def test_mp_func_docstrings(self):
+        """Test for the presence of docstrings in MeteredQueuePool methods"""
+        for func in self.mp_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+class TestMeteredQueuePool(unittest.TestCase):
+    """Test the pool settings and statistics against a SQLite file"""
+
+    def setUp(self):
+        """Set the path of the database"""
+        self.path = "test_pool.db"
+        self.engines = []
+
+    def tearDown(self):
+        """Dispose of the engines and remove the database"""
+        for engine in self.engines:
+            engine.dispose()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def engine(self, **settings):
+        """returns an engine on the database with the pool of the
+        environment variables of settings"""
+        with mock.patch.dict(os.environ, settings):
+            options = DBStorage.pool_options()
+        engine = create_engine("sqlite:///" + self.path,
+                               connect_args={"check_same_thread": False},
+                               **options)
+        self.engines.append(engine)
+        return engine
+
+    def test_options(self):
+        """Test that the variables set the pool arguments"""
+        with mock.patch.dict(os.environ, {"HBNB_MYSQL_POOL_SIZE": "3",
+                                          "HBNB_MYSQL_MAX_OVERFLOW": "0",
+                                          "HBNB_MYSQL_POOL_TIMEOUT": "2.5",
+                                          "HBNB_MYSQL_POOL_RECYCLE": "60",
+                                          "HBNB_MYSQL_POOL_PRE_PING": "no"}):
+            options = DBStorage.pool_options()
+        self.assertEqual(options, {"poolclass": MeteredQueuePool,
+                                   "pool_size": 3, "max_overflow": 0,
+                                   "pool_timeout": 2.5, "pool_recycle": 60,
+                                   "pool_pre_ping": False})
+        engine = self.engine(HBNB_MYSQL_POOL_SIZE="3")
+        self.assertIsInstance(engine.pool, MeteredQueuePool)
+        self.assertEqual(engine.pool.size(), 3)
+        self.assertTrue(engine.pool._pre_ping)
+
+    def test_warm(self):
+        """Test that warm opens the pool size and leaves it checked in"""
+        engine = self.engine(HBNB_MYSQL_POOL_SIZE="3")
+        engine.pool.warm()
+        stats = engine.pool.stats()
+        self.assertEqual(stats["checked_in"], 3)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["checkouts"], 0)
+
+    def test_checkouts(self):
+        """Test that every checkout is counted and timed"""
+        engine = self.engine()
+        for i in range(4):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        stats = engine.pool.stats()
+        self.assertEqual(stats["checkouts"], 4)
+        self.assertEqual(stats["timeouts"], 0)
+        self.assertGreater(stats["wait_max_ms"], 0)
+        self.assertLessEqual(stats["wait_p50_ms"], stats["wait_max_ms"])
+        self.assertLessEqual(stats["wait_p95_ms"], stats["wait_max_ms"])
+
+    def test_timeout(self):
+        """Test that a checkout finding the pool exhausted is counted"""
+        engine = self.engine(HBNB_MYSQL_POOL_SIZE="1",
+                             HBNB_MYSQL_MAX_OVERFLOW="0",
+                             HBNB_MYSQL_POOL_TIMEOUT="0.05")
+        with engine.connect():
+            with self.assertRaises(TimeoutError):
+                engine.connect()
+            self.assertEqual(engine.pool.stats()["checked_out"], 1)
+        stats = engine.pool.stats()
+        self.assertEqual(stats["checkouts"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+
+    def test_dispose(self):
+        """Test that the statistics outlive the pool dispose() replaces"""
+        engine = self.engine()
+        with engine.connect():
+            pass
+        engine.dispose()
+        with engine.connect():
+            pass
+        self.assertEqual(engine.pool.stats()["checkouts"], 2)
@@ -18,6 +18,7 @@ import json
 import os
 import pep8
 import unittest
+from unittest import mock
 DBStorage = db_storage.DBStorage
 classes = {"Amenity": Amenity, "City": City, "Place": Place,
            "Review": Review, "State": State, "User": User}
@@ -186,6 +187,14 @@ class TestDBStorageGet(unittest.TestCase):
         models.storage.new(new_state)
         self.assertIsNone(models.storage.get(City, new_state.id))
 
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_get_class_name(self):
+        new_state = State()
+        new_state.name = "California"
+        models.storage.new(new_state)
+        self.assertIs(models.storage.get("State", new_state.id), new_state)
+        self.assertIsNone(models.storage.get("City", new_state.id))
+
 
 class TestDBStorageCount(unittest.TestCase):
     """Test Class for all count cases"""
@@ -214,3 +223,93 @@ class TestDBStorageCount(unittest.TestCase):
         models.storage.new(new_city)
 
         self.assertEqual(models.storage.count(), 2)
+
+
+class TestDBStorageCounts(unittest.TestCase):
+    """Test the counts method of the DBStorage class"""
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_counts_every_class(self):
+        """Test counts matches count for every class"""
+        new_state = State()
+        new_state.name = "California"
+        models.storage.new(new_state)
+        models.storage.save()
+        counts = models.storage.counts()
+        self.assertEqual(set(counts), set(classes))
+        for name, cls in classes.items():
+            self.assertEqual(counts[name], models.storage.count(cls))
+
+
+@unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+class TestDBStorageQuery(unittest.TestCase):
+    """Test the query and get_many methods of the DBStorage class"""
+
+    def setUp(self):
+        """Store places of two cities"""
+        models.storage.close()
+        self.state = State(name="California")
+        self.user = User(email="a@b.c", password="pwd")
+        self.cities = [City(name="c" + str(i), state_id=self.state.id)
+                       for i in range(2)]
+        self.places = []
+        for i, price in enumerate([120, 80, 40, 80, 200, 60]):
+            place = Place(city_id=self.cities[i % 2].id, name="p" + str(i),
+                          user_id=self.user.id, price_by_night=price)
+            place.created_at = datetime(2024, 1, 1, 0, 0, i)
+            self.places.append(place)
+        for obj in [self.state, self.user] + self.cities + self.places:
+            models.storage.new(obj)
+        models.storage.save()
+
+    def tearDown(self):
+        """Delete the stored objects"""
+        models.storage.close()
+        for obj in self.places + self.cities + [self.state, self.user]:
+            models.storage.delete(models.storage.get(type(obj), obj.id))
+            models.storage.save()
+        models.storage.close()
+
+    def ids(self, objs):
+        """Return the ids of objs"""
+        return [obj.id for obj in objs]
+
+    def test_query_default(self):
+        """Test that objects come by (created_at, id), offset then limit"""
+        places = models.storage.query(Place, {"city_id": ("in", self.ids(
+            self.cities))})
+        self.assertEqual(self.ids(places), self.ids(self.places))
+        places = models.storage.query("Place", {"city_id": ("in", self.ids(
+            self.cities))}, limit=2, offset=3)
+        self.assertEqual(self.ids(places), self.ids(self.places[3:5]))
+
+    def test_query_where_order_by(self):
+        """Test the places of a city under a price, cheapest first"""
+        p = self.places
+        # ties are ordered by id
+        eighty = sorted([p[1], p[3]], key=lambda place: place.id)
+        where = {"city_id": self.cities[1].id, "price_by_night": ("<", 100)}
+        self.assertEqual(self.ids(models.storage.query(
+            Place, where, order_by="price_by_night")),
+            self.ids([p[5]] + eighty))
+        self.assertEqual(self.ids(models.storage.query(
+            Place, where, order_by=["-price_by_night"], limit=2)),
+            self.ids(eighty))
+        where = {"city_id": self.cities[0].id, "name": ("!=", "p0")}
+        self.assertEqual(self.ids(models.storage.query(Place, where)),
+                         self.ids([p[2], p[4]]))
+
+    def test_get_many(self):
+        """Test that the listed objects are found in batches by id"""
+        ids = self.ids(self.places[::2]) + ["nope", self.places[0].id]
+        with mock.patch.object(DBStorage, "_DBStorage__batch_size", 2):
+            found = models.storage.get_many(Place, ids)
+        self.assertEqual(set(found), set(self.ids(self.places[::2])))
+        self.assertEqual(found[self.places[2].id].name, "p2")
+        self.assertEqual(models.storage.get_many("City", ids), {})
+
+    def test_query_errors(self):
+        """Test that an unknown column or operator raises ValueError"""
+        with self.assertRaises(ValueError):
+            models.storage.query(Place, {"nope": 1})
+        with self.assertRaises(ValueError):
+            models.storage.query(Place, {"price_by_night": ("~", 1)})
@@ -5,8 +5,9 @@ Contains the TestFileStorageDocs classes
 
 from datetime import datetime
 import inspect
+import io
 import models
-from models.engine import file_storage
+from models.engine import file_storage, snapshot
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
@@ -14,10 +15,16 @@ from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+import glob
 import json
+import multiprocessing
 import os
 import pep8
+import threading
+import time
 import unittest
+from unittest import mock
+import zlib
 FileStorage = file_storage.FileStorage
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
@@ -175,6 +182,16 @@ class TestFileStorageGet(unittest.TestCase):
         self.assertIsNone(storage.get(City, obj.id))
         self.assertIsNone(storage.get(City, obj.id))
 
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_get_class_name(self):
+        """Test get with a class name returns object"""
+        storage = FileStorage()
+        obj = State()
+        storage.new(obj)
+        self.assertIs(storage.get("State", obj.id), obj)
+        self.assertIsNone(storage.get("City", obj.id))
+        self.assertIsNone(storage.get("Unknown", obj.id))
+
     def test_all_returns_dict(self):
         """Test that all returns the FileStorage.__objects attr"""
         storage = FileStorage()
@@ -215,5 +232,1245 @@ class TestFileStorageGet(unittest.TestCase):
             new_dict[key] = value.to_dict()
         string = json.dumps(new_dict)
         with open("file.json", "r") as f:
-            js = f.read()
-        self.assertEqual(json.loads(string), json.loads(js))
+            js = json.loads(f.read())
+        del js["__meta__"]
+        self.assertEqual(json.loads(string), js)
+
+
+class FileStorageFixture:
+    """Mixin giving every test an empty FileStorage on scratch files
+
+    Every class attribute of FileStorage is saved in setUp and put back
+    once the test is done, so that tests may change any of them; those
+    holding objects start empty, and the settings at their defaults
+    whatever the environment sets.
+    """
+    # string - the scratch file; the files named after it are removed too
+    path = "test_file_storage.json"
+
+    def setUp(self):
+        """Save FileStorage and point it at the scratch file"""
+        saved = {name: value for name, value in vars(FileStorage).items()
+                 if name.startswith("_FileStorage__") and
+                 not inspect.isroutine(value)}
+        self.addCleanup(self.restore_storage, saved)
+        scratch = {"file_path": self.path, "format": "json", "shards": 0,
+                   "relayout": False, "layout": None, "objects": {},
+                   "partitions": {}, "pending": {}, "lazy": False,
+                   "partitioned_from": None, "shared": set(),
+                   "references": {}, "referenced": {},
+                   "amenity_places": {}, "ordered": {}, "journal": None,
+                   "changes": {}, "compaction": None, "stamps": {},
+                   "fragments": {}, "synced": None, "flush_interval": 0,
+                   "flush_after": 100, "dirty_since": None,
+                   "fsync": "never", "unsynced": set(),
+                   "read_retries": 3, "stream_size": 64 << 20}
+        for name, value in scratch.items():
+            setattr(FileStorage, "_FileStorage__" + name, value)
+
+    def restore_storage(self, saved):
+        """Put back the saved class attributes and remove the scratch
+        files"""
+        # threads started meanwhile keep running: forgetting them would
+        # start others
+        saved.pop("_FileStorage__flusher")
+        saved.pop("_FileStorage__syncer")
+        for name, value in saved.items():
+            setattr(FileStorage, name, value)
+        root = os.path.splitext(self.path)[0]
+        for path in glob.glob(glob.escape(root) + ".*"):
+            os.remove(path)
+
+    def forget(self):
+        """Forget every object, for a reload to read them all back"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__stamps = {}
+
+
+class TestFileStorageJournal(FileStorageFixture, unittest.TestCase):
+    """Test the journaled mode of FileStorage"""
+
+    path = "test_journal.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file with journaling on"""
+        super().setUp()
+        FileStorage._FileStorage__journal = file_storage.Journal(
+            self.path + ".log")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_appends_to_log(self):
+        """Test that save appends records instead of writing the file"""
+        storage = FileStorage()
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.path + ".log") as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["data"]["name"], "California")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reload_replays_log(self):
+        """Test that reload replays new, update and delete records"""
+        storage = FileStorage()
+        kept = State(name="California")
+        gone = State(name="Nevada")
+        storage.new(kept)
+        storage.new(gone)
+        storage.save()
+        kept.name = "Arizona"
+        storage.new(kept)
+        storage.delete(gone)
+        storage.save()
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(list(storage.all()), ["State." + kept.id])
+        self.assertEqual(storage.all()["State." + kept.id].name, "Arizona")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_applies_appended_records(self):
+        """Test that close applies records another writer appended"""
+        storage = FileStorage()
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        other = State(name="Nevada")
+        file_storage.Journal(self.path + ".log").append(
+            [("State." + other.id, other.to_dict())])
+        storage.close()
+        self.assertIs(storage.all()["State." + state.id], state)
+        self.assertEqual(storage.all()["State." + other.id].name, "Nevada")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_compact(self):
+        """Test that compaction folds the log into the JSON file"""
+        storage = FileStorage()
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        storage.compact().join()
+        self.assertFalse(os.path.exists(self.path + ".log"))
+        self.assertFalse(os.path.exists(self.path + ".log.old"))
+        with open(self.path) as f:
+            self.assertIn("State." + state.id, json.load(f))
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertIn("State." + state.id, storage.all())
+
+
+class TestFileStorageClose(FileStorageFixture, unittest.TestCase):
+    """Test that close only reads back what changed on disk"""
+
+    path = "test_close.json"
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_unchanged_file(self):
+        """Test that close keeps the objects when the file is unchanged"""
+        storage = FileStorage()
+        state = State(name="California")
+        storage.new(state)
+        storage.save()
+        storage.close()
+        self.assertIs(storage.all()["State." + state.id], state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_applies_difference(self):
+        """Test that close rebuilds only the objects changed on disk"""
+        storage = FileStorage()
+        kept = State(name="California")
+        changed = State(name="Nevada")
+        removed = State(name="Texas")
+        for obj in (kept, changed, removed):
+            storage.new(obj)
+        storage.save()
+        with open(self.path) as f:
+            records = json.load(f)
+        del records["__meta__"]
+        records["State." + changed.id]["name"] = "Arizona"
+        records["State." + changed.id]["updated_at"] = \
+            "2030-01-01T00:00:00.000000"
+        del records["State." + removed.id]
+        with open(self.path, "w") as f:
+            json.dump(records, f)
+        storage.close()
+        objects = storage.all()
+        self.assertIs(objects["State." + kept.id], kept)
+        self.assertEqual(objects["State." + changed.id].name, "Arizona")
+        self.assertNotIn("State." + removed.id, objects)
+
+
+class TestFileStoragePartitions(FileStorageFixture, unittest.TestCase):
+    """Test the per-class partitions of FileStorage"""
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_all_cls_is_read_only_snapshot(self):
+        """Test that all(cls) is a read-only snapshot of one class"""
+        storage = FileStorage()
+        first = State()
+        storage.new(first)
+        view = storage.all(State)
+        state = State()
+        storage.new(state)
+        storage.new(City())
+        storage.delete(first)
+        self.assertEqual(list(view.values()), [first])
+        self.assertEqual(list(storage.all("State").values()), [state])
+        with self.assertRaises(TypeError):
+            view["State.x"] = state
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_all_is_snapshot(self):
+        """Test that the dictionary all() returned is not changed by
+        later calls to new or delete, nor copied when nothing changes"""
+        storage = FileStorage()
+        state = State()
+        storage.new(state)
+        objects = storage.all()
+        self.assertIs(storage.all(), objects)
+        storage.new(City())
+        storage.delete(state)
+        self.assertEqual(list(objects), ["State." + state.id])
+        self.assertEqual(len(storage.all()), 1)
+        self.assertEqual(storage.count(State), 0)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_count_follows_new_and_delete(self):
+        """Test that count(cls) follows new and delete"""
+        storage = FileStorage()
+        states = [State() for i in range(3)]
+        for state in states:
+            storage.new(state)
+        storage.new(City())
+        self.assertEqual(storage.count(State), 3)
+        self.assertEqual(storage.count("City"), 1)
+        self.assertEqual(storage.count(), 4)
+        storage.delete(states[0])
+        self.assertEqual(storage.count(State), 2)
+        self.assertEqual(storage.count(Amenity), 0)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_counts(self):
+        """Test that counts gives every class count at once"""
+        storage = FileStorage()
+        storage.new(State())
+        storage.new(State())
+        city = City()
+        storage.new(city)
+        storage.delete(city)
+        counts = storage.counts()
+        self.assertEqual(set(counts), set(classes))
+        self.assertEqual(counts["State"], 2)
+        self.assertEqual(counts["City"], 0)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_partitions_follow_replaced_objects(self):
+        """Test that partitions are rebuilt when __objects is replaced"""
+        storage = FileStorage()
+        storage.new(State())
+        city = City()
+        FileStorage._FileStorage__objects = {"City." + city.id: city}
+        self.assertEqual(storage.count(State), 0)
+        self.assertEqual(list(storage.all(City).values()), [city])
+
+
+class TestFileStorageReferences(FileStorageFixture, unittest.TestCase):
+    """Test the foreign key reverse indexes of FileStorage"""
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_referencing_follows_updates(self):
+        """Test that the index follows new, delete and key updates"""
+        storage = FileStorage()
+        state = State()
+        other = State()
+        cities = [City(state_id=state.id) for i in range(2)]
+        for city in cities:
+            storage.new(city)
+        self.assertEqual(storage.referencing(City, "state_id", state.id),
+                         cities)
+        storage.delete(cities[0])
+        self.assertEqual(storage.referencing(City, "state_id", state.id),
+                         cities[1:])
+        cities[1].state_id = other.id
+        self.assertEqual(storage.referencing(City, "state_id", state.id),
+                         [])
+        self.assertEqual(storage.referencing("City", "state_id", other.id),
+                         cities[1:])
+        self.assertEqual(storage.query(City, {"state_id": other.id}),
+                         cities[1:])
+        # past __setattr__, the stale hit is still left out
+        cities[1].__dict__["state_id"] = state.id
+        self.assertEqual(storage.referencing(City, "state_id", other.id),
+                         [])
+        self.assertEqual(storage.query(City, {"state_id": other.id}), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_relationship_properties(self):
+        """Test that the relationship getters read the indexes"""
+        user = User()
+        state = State()
+        city = City(state_id=state.id)
+        place = Place(city_id=city.id, user_id=user.id)
+        review = Review(place_id=place.id, user_id=user.id)
+        amenity = Amenity()
+        place.amenity_ids = [amenity.id]
+        for obj in (user, state, city, place, review, amenity):
+            models.storage.new(obj)
+        self.assertEqual(state.cities, [city])
+        self.assertEqual(city.places, [place])
+        self.assertEqual(place.reviews, [review])
+        self.assertEqual(place.amenities, [amenity])
+        self.assertEqual(user.places, [place])
+        self.assertEqual(user.reviews, [review])
+
+
+class TestFileStorageSearchPlaces(FileStorageFixture, unittest.TestCase):
+    """Test the search_places method of FileStorage"""
+
+    def setUp(self):
+        """Fill an empty FileStorage with two states of places"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.states = [State(), State()]
+        self.cities = [City(state_id=state.id) for state in self.states]
+        self.amenity = Amenity()
+        self.places = [Place(city_id=self.cities[i % 2].id)
+                       for i in range(4)]
+        for i, place in enumerate(self.places):
+            place.created_at = datetime(2024, 1, 1, 0, 0, i)
+        self.places[1].amenity_ids = [self.amenity.id]
+        for obj in self.states + self.cities + self.places:
+            self.storage.new(obj)
+        self.storage.new(self.amenity)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_search_states_and_cities(self):
+        """Test that states and cities give the union of their places"""
+        search = self.storage.search_places
+        self.assertEqual(search([self.states[0].id]), self.places[0::2])
+        self.assertEqual(search([self.states[0].id], [self.cities[1].id]),
+                         self.places)
+        self.assertEqual(search(["unknown"]), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_search_amenities(self):
+        """Test that amenities select the places having all of them"""
+        search = self.storage.search_places
+        self.assertEqual(search(amenities=[self.amenity.id]),
+                         [self.places[1]])
+        self.assertEqual(search(amenities=[self.amenity.id, "unknown"]), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_search_pages(self):
+        """Test that results are ordered and paged by (created_at, id)"""
+        search = self.storage.search_places
+        self.assertEqual(search(), self.places)
+        after = (self.places[1].created_at, self.places[1].id)
+        self.assertEqual(search(after=after, limit=1), [self.places[2]])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_places_with_amenities(self):
+        """Test that the amenity index follows new and delete"""
+        other = Amenity()
+        self.storage.new(other)
+        self.places[2].amenity_ids = [self.amenity.id, other.id]
+        self.storage.new(self.places[2])
+        found = self.storage.places_with_amenities([self.amenity.id])
+        self.assertEqual(sorted(found, key=self.places.index),
+                         self.places[1:3])
+        self.assertEqual(self.storage.places_with_amenities(
+            [self.amenity.id, other.id]), [self.places[2]])
+        self.storage.delete(self.places[2])
+        self.assertEqual(self.storage.places_with_amenities([other.id]), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_amenity_facets(self):
+        """Test that facets count the places having each amenity"""
+        place_ids = [place.id for place in self.places]
+        self.assertEqual(self.storage.amenity_facets(place_ids),
+                         {self.amenity.id: 1})
+        self.assertEqual(self.storage.amenity_facets(place_ids[2:]), {})
+
+
+class TestFileStoragePage(FileStorageFixture, unittest.TestCase):
+    """Test the page method of FileStorage"""
+
+    def setUp(self):
+        """Fill an empty FileStorage with states created in order"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.states = [State() for i in range(4)]
+        for i, state in enumerate(self.states):
+            state.created_at = datetime(2024, 1, 1, 0, 0, i)
+            self.storage.new(state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_page(self):
+        """Test that pages follow (created_at, id) after a cursor"""
+        self.assertEqual(self.storage.page(State), self.states)
+        self.assertEqual(self.storage.page(State, limit=3), self.states[:3])
+        after = (self.states[1].created_at, self.states[1].id)
+        self.assertEqual(self.storage.page("State", after=after, limit=1),
+                         [self.states[2]])
+        self.assertEqual(self.storage.page(City), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_page_follows_new_and_delete(self):
+        """Test that the sorted index follows new and delete"""
+        self.storage.page(State)
+        first = State()
+        first.created_at = datetime(2023, 1, 1)
+        self.storage.new(first)
+        self.storage.delete(self.states[2])
+        self.assertEqual(self.storage.page(State),
+                         [first] + self.states[:2] + self.states[3:])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_page_where(self):
+        """Test that where restricts the page to matching objects"""
+        cities = [City(state_id=self.states[0].id) for i in range(3)]
+        for i, city in enumerate(cities):
+            city.created_at = datetime(2024, 1, 1, 0, 0, 3 - i)
+            self.storage.new(city)
+        self.storage.new(City(state_id=self.states[1].id))
+        where = {"state_id": self.states[0].id}
+        self.assertEqual(self.storage.page(City, where), cities[::-1])
+        self.assertEqual(self.storage.page(City, where, limit=1),
+                         [cities[2]])
+
+
+class TestFileStorageQuery(FileStorageFixture, unittest.TestCase):
+    """Test the query method of FileStorage"""
+
+    def setUp(self):
+        """Fill an empty FileStorage with places of two cities"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.cities = [City(name="c" + str(i)) for i in range(2)]
+        self.places = []
+        for i, price in enumerate([120, 80, 40, 80, 200, 60]):
+            place = Place(city_id=self.cities[i % 2].id, name="p" + str(i),
+                          price_by_night=price)
+            place.created_at = datetime(2024, 1, 1, 0, 0, i)
+            self.places.append(place)
+        for obj in self.cities + self.places:
+            self.storage.new(obj)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_default(self):
+        """Test that objects come by (created_at, id), offset then limit"""
+        self.assertEqual(self.storage.query(Place), self.places)
+        self.assertEqual(self.storage.query("Place", limit=2, offset=3),
+                         self.places[3:5])
+        self.assertEqual(self.storage.query(Place, offset=10), [])
+        self.assertEqual(self.storage.query("Nope"), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_where_order_by(self):
+        """Test the places of a city under a price, cheapest first"""
+        p = self.places
+        # ties are ordered by id
+        eighty = sorted([p[1], p[3]], key=lambda place: place.id)
+        where = {"city_id": self.cities[1].id, "price_by_night": ("<", 100)}
+        self.assertEqual(self.storage.query(Place, where,
+                                            order_by="price_by_night"),
+                         [p[5]] + eighty)
+        self.assertEqual(self.storage.query(Place, where,
+                                            order_by=["-price_by_night"],
+                                            limit=2), eighty)
+        where = {"city_id": ("in", [city.id for city in self.cities]),
+                 "name": ("!=", "p0")}
+        self.assertEqual(self.storage.query(Place, where), p[1:])
+        where = {"price_by_night": (">=", 80), "name": ("in", ("p0", "p1"))}
+        self.assertEqual(self.storage.query(Place, where), p[:2])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_none(self):
+        """Test that None meets no condition but equality to None"""
+        self.places[0].description = None
+        self.assertEqual(self.storage.query(Place, {"description": None}),
+                         self.places[:1])
+        for op in ("!=", "<", ">="):
+            self.assertNotIn(self.places[0], self.storage.query(
+                Place, {"description": (op, "x")}))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_query_unknown_operator(self):
+        """Test that an unknown operator raises ValueError"""
+        with self.assertRaises(ValueError):
+            self.storage.query(Place, {"price_by_night": ("~", 1)})
+
+
+class TestFileStorageGetMany(FileStorageFixture, unittest.TestCase):
+    """Test the get_many method of FileStorage"""
+
+    def setUp(self):
+        """Fill an empty FileStorage with a few states"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.states = [State(name=str(i)) for i in range(3)]
+        for state in self.states:
+            self.storage.new(state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_get_many(self):
+        """Test that the listed objects are found by id, others left out"""
+        ids = [self.states[2].id, "nope", self.states[0].id, 5]
+        self.assertEqual(self.storage.get_many(State, ids),
+                         {self.states[2].id: self.states[2],
+                          self.states[0].id: self.states[0]})
+        self.assertEqual(self.storage.get_many("City", ids), {})
+        self.assertEqual(self.storage.get_many("Nope", ids), {})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_place_amenities(self):
+        """Test that the amenities of a place are found in their order"""
+        amenities = [Amenity(name=str(i)) for i in range(3)]
+        for amenity in amenities:
+            self.storage.new(amenity)
+        place = Place(amenity_ids=[amenities[2].id, "nope", amenities[0].id])
+        with mock.patch.object(models, "storage", self.storage):
+            self.assertEqual(place.amenities, [amenities[2], amenities[0]])
+
+
+class TestFileStorageLazy(FileStorageFixture, unittest.TestCase):
+    """Test that lazy mode builds objects only when they are accessed"""
+
+    path = "test_lazy.json"
+
+    def setUp(self):
+        """Save a few objects to a scratch file and reload it lazily"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.state = State(name="California")
+        self.city = City(state_id=self.state.id, name="Fresno")
+        self.storage.new(self.state)
+        self.storage.new(self.city)
+        self.storage.save()
+        self.forget()
+        FileStorage._FileStorage__lazy = True
+        self.storage.reload()
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_count_without_building(self):
+        """Test that pending records are counted but not built"""
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertEqual(self.storage.count(), 2)
+        self.assertEqual(self.storage.counts()["City"], 1)
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_get_builds_one_object(self):
+        """Test that get builds only the object it returns"""
+        state = self.storage.get(State, self.state.id)
+        self.assertEqual(state.to_dict(), self.state.to_dict())
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         ["State." + self.state.id])
+        self.assertIs(self.storage.get(State, self.state.id), state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_references_of_pending_records(self):
+        """Test that pending records are indexed by their foreign keys"""
+        cities = self.storage.referencing(City, "state_id", self.state.id)
+        self.assertEqual([city.id for city in cities], [self.city.id])
+        self.assertEqual(self.storage.page(State)[0].id, self.state.id)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_all_builds_everything(self):
+        """Test that all() builds every pending record"""
+        self.assertEqual(len(self.storage.all()), 2)
+        self.assertEqual(FileStorage._FileStorage__pending,
+                         {"City": {}, "State": {}})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_writes_pending_records(self):
+        """Test that saving keeps the records that were never built"""
+        self.storage.get(State, self.state.id)
+        self.storage.save()
+        with open(self.path, "r") as f:
+            self.assertEqual(json.load(f)["City." + self.city.id],
+                             self.city.to_dict())
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_concurrent_builds(self):
+        """Test that readers building the same records at once all get
+        the same objects"""
+        states = [State(name=str(i)) for i in range(200)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.save()
+        self.forget()
+        self.storage.reload()
+        found = []
+
+        def read():
+            """Get every state"""
+            found.append([self.storage.get(State, state.id)
+                          for state in reversed(states)])
+
+        threads = [threading.Thread(target=read) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(found), 8)
+        self.assertNotIn(None, found[0])
+        for objs in found[1:]:
+            self.assertTrue(all(a is b for a, b in zip(objs, found[0])))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_built_reads_share_lock(self):
+        """Test that reads of built objects need no write lock while
+        records of other classes are still pending"""
+        self.storage.get(State, self.state.id)
+        found = []
+        with FileStorage._FileStorage__rw.read():
+            reader = threading.Thread(target=lambda: found.append(
+                self.storage.all(State)))
+            reader.start()
+            reader.join(5)
+            self.assertFalse(reader.is_alive())
+        self.assertEqual(list(found[0]), ["State." + self.state.id])
+        self.assertEqual(self.storage.count(City), 1)
+
+
+class TestFileStorageStreaming(FileStorageFixture, unittest.TestCase):
+    """Test that the JSON file is read one record at a time"""
+
+    path = "test_streaming.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file"""
+        super().setUp()
+        self.storage = FileStorage()
+
+    def test_read_records_chunks(self):
+        """Test that records split across chunks are read whole"""
+        records = {"State.1": {"name": "Café", "n": [1, 2.5]},
+                   "City.2": {"name": "A \"quoted\" name"}, "x": 12345}
+        text = json.dumps(records).encode()
+        for size in (1, 3, 64):
+            f = io.BytesIO(text)
+            self.assertEqual(dict(snapshot.read_records(f, size)), records)
+
+    def test_read_records_malformed(self):
+        """Test that a truncated or non-object file is rejected"""
+        for text in (b"", b"[]", b'{"a": 1', b'{"a": 1,}'):
+            with self.assertRaises(ValueError):
+                list(snapshot.read_records(io.BytesIO(text), 4))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reload_reports_progress(self):
+        """Test that reload reports the bytes read out of the file size"""
+        states = [State(name=str(i)) for i in range(20)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.save()
+        self.forget()
+        reports = []
+        self.storage.reload(progress=lambda done, size:
+                            reports.append((done, size)))
+        size = os.path.getsize(self.path)
+        self.assertEqual(reports[-1], (size, size))
+        self.assertEqual(self.storage.count(State), 20)
+        self.assertEqual(self.storage.get(State, states[3].id).name, "3")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reload_streams_large_files(self):
+        """Test that only files above the stream size are streamed"""
+        states = [State(name=str(i)) for i in range(5)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.save()
+        for stream_size, streamed in ((64 << 20, False), (0, True)):
+            FileStorage._FileStorage__stream_size = stream_size
+            self.forget()
+            with mock.patch.object(snapshot, "verify",
+                                   wraps=snapshot.verify) as verify, \
+                    mock.patch.object(snapshot, "read_whole",
+                                      wraps=snapshot.read_whole) as whole:
+                self.storage.reload()
+            self.assertEqual(verify.called, streamed)
+            self.assertEqual(whole.called, not streamed)
+            self.assertEqual(self.storage.count(State), 5)
+            self.assertEqual(self.storage.get(State, states[2].id).name, "2")
+
+
+class TestFileStorageDirty(FileStorageFixture, unittest.TestCase):
+    """Test that a save only serializes the objects that changed"""
+
+    path = "test_dirty.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file holding a few states"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.states = [State(name=str(i)) for i in range(5)]
+        for state in self.states:
+            self.storage.new(state)
+        self.storage.save()
+
+    def saved_names(self):
+        """Return the names of the states in the file, by id"""
+        self.forget()
+        self.storage.reload()
+        return {state.id: state.name
+                for state in self.storage.all(State).values()}
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_only_dirty_serialized(self):
+        """Test that clean objects are written from their cached record"""
+        with mock.patch.object(State, "to_dict", autospec=True,
+                               side_effect=BaseModel.to_dict) as to_dict:
+            self.storage.save()
+            self.assertEqual(to_dict.call_count, 0)
+            self.states[2].name = "two"
+            self.storage.save()
+            self.assertEqual(to_dict.call_count, 1)
+            self.states[3].save()
+            self.assertEqual(to_dict.call_count, 2)
+        names = self.saved_names()
+        self.assertEqual(names[self.states[2].id], "two")
+        self.assertEqual(len(names), 5)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_deleted_not_written(self):
+        """Test that the record of a deleted object is not written again"""
+        self.storage.delete(self.states[0])
+        self.storage.save()
+        self.assertNotIn(self.states[0].id, self.saved_names())
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_failed_write_stays_dirty(self):
+        """Test that objects of a failed write are serialized again"""
+        self.states[1].name = "one"
+        with mock.patch.object(os, "replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        self.assertTrue(self.states[1]._dirty)
+        self.storage.save()
+        self.assertEqual(self.saved_names()[self.states[1].id], "one")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_format_change(self):
+        """Test that cached records are not reused in another format"""
+        FileStorage._FileStorage__format = "binary"
+        self.storage.save()
+        with open(self.path, "rb") as f:
+            self.assertTrue(snapshot.is_binary(f))
+        self.assertEqual(len(self.saved_names()), 5)
+
+
+class TestFileStorageShards(FileStorageFixture, unittest.TestCase):
+    """Test that every class can be stored in its own shard files"""
+
+    path = "test_shards.json"
+
+    def setUp(self):
+        """Point FileStorage at scratch shards holding a few objects"""
+        super().setUp()
+        FileStorage._FileStorage__shards = 2
+        self.storage = FileStorage()
+        self.states = [State(name=str(i)) for i in range(6)]
+        for state in self.states:
+            self.storage.new(state)
+        self.city = City(name="Fresno", state_id=self.states[0].id)
+        self.storage.new(self.city)
+        self.storage.save()
+
+    def files(self):
+        """Return the {path: inode} of the data files"""
+        return {path: os.stat(path).st_ino
+                for path in glob.glob("test_shards*.json")}
+
+    def shards(self, objs, count):
+        """Return the paths of the shards of objs out of count per class"""
+        return {"test_shards.{}.{}.json".format(
+            obj.__class__.__name__, zlib.crc32(obj.id.encode()) % count)
+            for obj in objs}
+
+    def reload(self):
+        """Forget every object and reload them from the files"""
+        self.forget()
+        self.storage.reload()
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_layout(self):
+        """Test that every class goes to its own shards only"""
+        self.assertEqual(set(self.files()),
+                         self.shards(self.states + [self.city], 2))
+        for path in glob.glob("test_shards.State.*.json"):
+            with open(path) as f:
+                self.assertTrue(all(key.startswith("State.")
+                                    for key in json.load(f)
+                                    if key != "__meta__"))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_only_changed_shards_written(self):
+        """Test that a save rewrites only the shards that changed"""
+        before = self.files()
+        self.city.name = "Sacramento"
+        self.storage.save()
+        after = self.files()
+        for path, inode in before.items():
+            if ".City." in path:
+                self.assertNotEqual(after[path], inode)
+            else:
+                self.assertEqual(after[path], inode)
+        self.reload()
+        self.assertEqual(self.storage.get(City, self.city.id).name,
+                         "Sacramento")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reload(self):
+        """Test that reload reads back every shard"""
+        reports = []
+        self.forget()
+        self.storage.reload(progress=lambda done, size:
+                            reports.append((done, size)))
+        self.assertEqual(self.storage.count(State), 6)
+        self.assertEqual(self.storage.count(City), 1)
+        size = sum(os.path.getsize(path) for path in self.files())
+        self.assertEqual(reports[-1], (size, size))
+        self.assertFalse(FileStorage._FileStorage__relayout)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_close_lists_files_once(self):
+        """Test that close() only lists the files again once another
+        writer bumped their generation"""
+        lock = FileStorage._FileStorage__file_lock
+        self.storage.close()
+        with mock.patch.object(os, "listdir", wraps=os.listdir) as listdir:
+            self.storage.close()
+            self.storage.close()
+            self.assertEqual(listdir.call_count, 0)
+            with lock.hold(self.path):
+                lock.bump(self.path)
+            self.storage.close()
+            listed = listdir.call_count
+            self.assertGreater(listed, 0)
+            self.storage.close()
+            self.assertEqual(listdir.call_count, listed)
+        self.assertEqual(self.storage.count(State), 6)
+
+    def test_binary_rejected(self):
+        """Test that shards cannot be combined with the binary format"""
+        FileStorage._FileStorage__format = "binary"
+        with self.assertRaises(ValueError):
+            FileStorage()
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_empty_shard_removed(self):
+        """Test that a shard whose objects were all deleted is removed"""
+        self.storage.delete(self.city)
+        self.storage.save()
+        self.assertFalse(glob.glob("test_shards.City.*"))
+        self.reload()
+        self.assertIsNone(self.storage.get(City, self.city.id))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_migration(self):
+        """Test that the next save moves the files to the layout set"""
+        FileStorage._FileStorage__shards = 0
+        self.reload()
+        self.assertTrue(FileStorage._FileStorage__relayout)
+        self.storage.save()
+        self.assertEqual(set(self.files()), {self.path})
+        FileStorage._FileStorage__shards = 3
+        self.reload()
+        self.storage.save()
+        self.assertEqual(set(self.files()),
+                         self.shards(self.states + [self.city], 3))
+        self.reload()
+        self.assertEqual(self.storage.count(State), 6)
+        self.assertEqual(self.storage.count(City), 1)
+
+
+class TestFileStorageBinary(FileStorageFixture, unittest.TestCase):
+    """Test the binary snapshot format"""
+
+    path = "test_binary.hbnb"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file in the binary format"""
+        super().setUp()
+        FileStorage._FileStorage__format = "binary"
+        self.storage = FileStorage()
+
+    def test_records_round_trip(self):
+        """Test that every kind of attribute value is read back"""
+        records = [("Place." + str(i), {
+            "__class__": "Place", "id": str(i), "name": "Café",
+            "number_rooms": 3, "latitude": 37.5, "amenity_ids": ["a", "b"],
+            "description": None, "flag": True,
+            "created_at": "2024-01-02T03:04:05.000006",
+            "updated_at": datetime(2024, 1, 2, 3, 4, 5, 7)})
+            for i in range(3)]
+        records.append(("State.1", {"__class__": "State", "id": "1"}))
+        f = io.BytesIO()
+        snapshot.write_binary_records(f, records)
+        f.seek(0)
+        self.assertTrue(snapshot.is_binary(f))
+        read = list(snapshot.read_binary_records(f))
+        self.assertEqual([key for key, data in read],
+                         [key for key, data in records])
+        data = read[0][1]
+        self.assertEqual(data["created_at"],
+                         datetime(2024, 1, 2, 3, 4, 5, 6))
+        self.assertEqual(data["updated_at"],
+                         datetime(2024, 1, 2, 3, 4, 5, 7))
+        del data["created_at"], data["updated_at"]
+        expected = dict(records[0][1])
+        del expected["created_at"], expected["updated_at"]
+        self.assertEqual(data, expected)
+
+    def test_uuid_ids_take_16_bytes(self):
+        """Test that UUID ids are stored as 16 bytes and read back"""
+        state = State()
+        f = io.BytesIO()
+        snapshot.write_binary_records(f, [("State." + state.id,
+                                           state.to_dict())])
+        self.assertNotIn(state.id.encode(), f.getvalue())
+        f.seek(0)
+        key, data = next(snapshot.read_binary_records(f))
+        self.assertEqual(key, "State." + state.id)
+
+    def test_truncated(self):
+        """Test that a truncated binary snapshot is rejected"""
+        f = io.BytesIO()
+        snapshot.write_binary_records(f, [("State.1", {"__class__": "State",
+                                                       "id": "1"})])
+        with self.assertRaises(ValueError):
+            list(snapshot.read_binary_records(io.BytesIO(f.getvalue()[:12])))
+
+    def test_checksum(self):
+        """Test that a damaged binary snapshot fails its CRC-32"""
+        f = io.BytesIO()
+        snapshot.write_binary_records(f, [("State.1", {"__class__": "State",
+                                                       "id": "1",
+                                                       "name": "Nevada"})])
+        raw = f.getvalue()
+        self.assertTrue(snapshot.verify(io.BytesIO(raw)))
+        self.assertIn("State", snapshot.read_index(raw))
+        damaged = raw.replace(b"Nevada", b"Nevadb")
+        self.assertFalse(snapshot.verify(io.BytesIO(damaged)))
+        self.assertIsNone(snapshot.read_index(damaged))
+        self.assertIsNone(snapshot.read_whole(io.BytesIO(damaged)))
+        # written before the trailer held a CRC-32
+        unchecked = damaged[:-8] + b"HBIX"
+        self.assertIsNone(snapshot.verify(io.BytesIO(unchecked)))
+        self.assertIn("State", snapshot.read_index(unchecked))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_reload(self):
+        """Test that objects saved in the binary format are reloaded"""
+        state = State(name="California")
+        place = Place(name="Home", number_rooms=2, amenity_ids=["a"])
+        self.storage.new(state)
+        self.storage.new(place)
+        self.storage.save()
+        with open(self.path, "rb") as f:
+            self.assertTrue(snapshot.is_binary(f))
+        expected = {key: obj.to_dict()
+                    for key, obj in self.storage.all().items()}
+        self.forget()
+        self.storage.reload()
+        self.assertEqual({key: obj.to_dict()
+                          for key, obj in self.storage.all().items()},
+                         expected)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_reload_detects_format(self):
+        """Test that a binary snapshot is written back as JSON when the
+        format changes"""
+        state = State(name="California")
+        self.storage.new(state)
+        self.storage.save()
+        self.forget()
+        FileStorage._FileStorage__format = "json"
+        self.storage.reload()
+        self.storage.save()
+        with open(self.path, "r") as f:
+            self.assertEqual(json.load(f)["State." + state.id],
+                             state.to_dict())
+
+
+class TestFileStorageWriteBehind(FileStorageFixture, unittest.TestCase):
+    """Test that write-behind mode coalesces saves"""
+
+    path = "test_write_behind.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file, in write-behind mode"""
+        super().setUp()
+        FileStorage._FileStorage__flush_interval = 60
+        FileStorage._FileStorage__flush_after = 3
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        """Write what the test left waiting"""
+        self.storage.flush()
+
+    def saved_keys(self):
+        """Return the keys in the scratch file, None if there is none"""
+        try:
+            with open(self.path, "r") as f:
+                return set(json.load(f)) - {"__meta__"}
+        except FileNotFoundError:
+            return None
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_defers_write(self):
+        """Test that save leaves the write to flush"""
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        self.assertIsNone(self.saved_keys())
+        self.storage.flush()
+        self.assertEqual(self.saved_keys(), {"State." + state.id})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_write_after_changes(self):
+        """Test that the flusher writes once enough changes are saved"""
+        states = [State() for i in range(3)]
+        for state in states:
+            self.storage.new(state)
+            self.storage.save()
+        for i in range(100):
+            if self.saved_keys() is not None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.saved_keys(),
+                         {"State." + state.id for state in states})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_write_after_interval(self):
+        """Test that the flusher writes within the interval"""
+        FileStorage._FileStorage__flush_interval = 0.05
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        for i in range(100):
+            if self.saved_keys() is not None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.saved_keys(), {"State." + state.id})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_save_does_not_wait_for_flush(self):
+        """Test that save returns while the flusher is writing, and that
+        flush waits for that write"""
+        FileStorage._FileStorage__flush_interval = 0.01
+        write = FileStorage._FileStorage__write
+        writing = threading.Event()
+        release = threading.Event()
+
+        def slow(storage):
+            """Write once the test lets it"""
+            writing.set()
+            release.wait(5)
+            write(storage)
+
+        state = State()
+        with mock.patch.object(FileStorage, "_FileStorage__write",
+                               autospec=True, side_effect=slow):
+            self.storage.new(state)
+            self.storage.save()
+            self.assertTrue(writing.wait(5))
+            saver = threading.Thread(target=self.storage.save)
+            saver.start()
+            saver.join(1)
+            self.assertFalse(saver.is_alive())
+            release.set()
+            self.storage.flush()
+        self.assertEqual(self.saved_keys(), {"State." + state.id})
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_flusher_survives_errors(self):
+        """Test that the flusher logs a failed write and retries it"""
+        FileStorage._FileStorage__flush_interval = 0.05
+        write = FileStorage._FileStorage__write
+        errors = [ValueError("not serializable")]
+
+        def fail_once(storage):
+            """Raise the first error, then write"""
+            if errors:
+                raise errors.pop()
+            write(storage)
+
+        state = State()
+        self.storage.new(state)
+        with mock.patch.object(FileStorage, "_FileStorage__write",
+                               autospec=True, side_effect=fail_once), \
+                self.assertLogs(file_storage.__name__, "ERROR") as logs:
+            self.storage.save()
+            for i in range(100):
+                if self.saved_keys() is not None:
+                    break
+                time.sleep(0.01)
+        self.assertIn("not serializable", logs.output[0])
+        self.assertTrue(FileStorage._FileStorage__flusher.is_alive())
+        self.assertEqual(self.saved_keys(), {"State." + state.id})
+
+
+class TestFileStorageCrashSafety(FileStorageFixture, unittest.TestCase):
+    """Test that snapshots are checksummed and published atomically"""
+
+    path = "test_crash_safety.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file"""
+        super().setUp()
+        FileStorage._FileStorage__read_retries = 0
+        self.storage = FileStorage()
+        self.state = State(name="California")
+        self.storage.new(self.state)
+        self.storage.save()
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_checksum(self):
+        """Test that the saved file passes its checksum, not a torn one"""
+        with open(self.path, "rb") as f:
+            self.assertTrue(snapshot.verify(f))
+            text = f.read()
+        self.assertFalse(snapshot.verify(io.BytesIO(text[:-2] + b"}")))
+        self.assertIsNone(snapshot.read_whole(io.BytesIO(text[:-2] + b"}")))
+        self.assertEqual(snapshot.read_whole(io.BytesIO(text)),
+                         [("State." + self.state.id, self.state.to_dict())])
+        self.assertIsNone(snapshot.verify(io.BytesIO(b"{}")))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_torn_file_keeps_objects(self):
+        """Test that reading a torn file leaves the objects alone"""
+        with open(self.path, "rb") as f:
+            text = f.read()
+        with open(self.path, "wb") as f:
+            f.write(text[:len(text) // 2])
+        FileStorage._FileStorage__synced = None
+        with self.assertLogs(file_storage.__name__, "ERROR") as logs:
+            self.storage.close()
+        self.assertIn("checksum", logs.output[0])
+        self.assertIs(self.storage.get(State, self.state.id), self.state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_unreadable_file_logged(self):
+        """Test that a file failing to parse is logged, not retried"""
+        FileStorage._FileStorage__read_retries = 3
+        with open(self.path, "wb") as f:
+            f.write(b'{"State.1": {"__class__": ')
+        FileStorage._FileStorage__synced = None
+        with mock.patch.object(file_storage, "sleep") as sleep, \
+                self.assertLogs(file_storage.__name__, "ERROR") as logs:
+            self.storage.close()
+        self.assertIn("Reading " + self.path + " failed", logs.output[0])
+        self.assertEqual(sleep.call_count, 0)
+        self.assertIs(self.storage.get(State, self.state.id), self.state)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_fsync_policy(self):
+        """Test that writes are flushed to disk as the policy says"""
+        with mock.patch.object(os, "fsync", wraps=os.fsync) as fsync:
+            self.storage.save()
+            self.assertEqual(fsync.call_count, 0)
+            FileStorage._FileStorage__fsync = "always"
+            self.storage.save()
+            # the file, then the directory holding it
+            self.assertEqual(fsync.call_count, 2)
+            FileStorage._FileStorage__fsync = "interval"
+            FileStorage._FileStorage__fsync_interval = 0.05
+            self.storage.save()
+            self.storage.save()
+            # every file before it replaces the previous one
+            self.assertEqual(fsync.call_count, 4)
+            # then the directory, once, by the syncer
+            for i in range(100):
+                if fsync.call_count > 4:
+                    break
+                time.sleep(0.01)
+            time.sleep(0.1)
+            self.assertEqual(fsync.call_count, 5)
+            self.assertFalse(FileStorage._FileStorage__unsynced)
+
+
+class TestFileStorageProcesses(FileStorageFixture, unittest.TestCase):
+    """Test that processes sharing a file write over each other's changes"""
+
+    path = "test_processes.json"
+
+    def setUp(self):
+        """Point FileStorage at a scratch file holding one state"""
+        super().setUp()
+        self.storage = FileStorage()
+        self.state = State(name="California")
+        self.storage.new(self.state)
+        self.storage.save()
+
+    @staticmethod
+    def add_states(names):
+        """Add and save states from another process, one save each"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__changes = {}
+        FileStorage._FileStorage__stamps = {}
+        FileStorage._FileStorage__synced = None
+        storage = FileStorage()
+        storage.reload()
+        for name in names:
+            storage.new(State(name=name))
+            storage.save()
+
+    def run_processes(self, *names):
+        """Run add_states in one forked process per list of names"""
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=self.add_states, args=(n,))
+                     for n in names]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+    def saved_names(self):
+        """Return the names of the states in the file"""
+        with open(self.path) as f:
+            return sorted(data["name"] for key, data in json.load(f).items()
+                          if key != "__meta__")
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_merge_on_write(self):
+        """Test that a save keeps what another process saved meanwhile"""
+        self.storage.new(State(name="Arizona"))
+        self.run_processes(["Nevada"])
+        self.storage.save()
+        self.assertEqual(self.saved_names(),
+                         ["Arizona", "California", "Nevada"])
+        self.assertEqual(self.storage.count(State), 3)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_unsaved_changes_win(self):
+        """Test that changes not saved yet are written over the file"""
+        self.state.name = "Oregon"
+        self.storage.new(self.state)
+        self.run_processes(["Nevada"])
+        self.storage.save()
+        self.assertEqual(self.saved_names(), ["Nevada", "Oregon"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_generation(self):
+        """Test that close sees the generation another process bumped"""
+        lock = FileStorage._FileStorage__file_lock
+        generation = lock.generation(self.path)
+        self.run_processes(["Nevada"])
+        self.assertEqual(lock.generation(self.path), generation + 1)
+        self.storage.close()
+        self.assertEqual(sorted(state.name for state in
+                                self.storage.all(State).values()),
+                         ["California", "Nevada"])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_concurrent_writers(self):
+        """Test that no save is lost when processes write at once"""
+        self.run_processes(*[["p{}-{}".format(p, i) for i in range(10)]
+                             for p in range(4)])
+        self.assertEqual(len(self.saved_names()), 41)
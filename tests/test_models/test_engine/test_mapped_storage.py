@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+"""
+Contains the TestMappedStorageDocs and TestMappedStorage classes
+"""
+
+from datetime import datetime
+import inspect
+import io
+import models
+from models.engine import mapped_storage, snapshot
+from models.amenity import Amenity
+from models.city import City
+from models.place import Place
+from models.state import State
+import os
+import pep8
+import unittest
+from unittest import mock
+MappedStorage = mapped_storage.MappedStorage
+
+
+class TestMappedStorageDocs(unittest.TestCase):
+    """Tests to check the documentation and style of MappedStorage class"""
+    @classmethod
+    def setUpClass(cls):
+        """Set up for the doc tests"""
+        cls.ms_f = inspect.getmembers(MappedStorage, inspect.isfunction)
+
+    def test_pep8_conformance_mapped_storage(self):
+        """Test that models/engine/mapped_storage.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['models/engine/mapped_storage.py'])
+        self.assertEqual(result.total_errors,
+                         0, result.messages)
+
+    def test_pep8_conformance_test_mapped_storage(self):
+        """Test tests/test_models/test_mapped_storage.py conforms to PEP8."""
+        pep8s = pep8.StyleGuide(quiet=True)
+        result = pep8s.check_files(['tests/test_models/test_engine/\
+test_mapped_storage.py'])
+        self.assertEqual(result.total_errors, 0,
+                         "Found code style errors (and warnings).")
+
+    def test_mapped_storage_module_docstring(self):
+        """Test for the mapped_storage.py module docstring"""
+        self.assertIsNot(mapped_storage.__doc__, None,
+                         "mapped_storage.py needs a docstring")
+        self.assertTrue(len(mapped_storage.__doc__) >= 1,
+                        "mapped_storage.py needs a docstring")
+
+    def test_mapped_storage_class_docstring(self):
+        """Test for the MappedStorage class docstring"""
+        self.assertIsNot(MappedStorage.__doc__, None,
+                         "MappedStorage class needs a docstring")
+        self.assertTrue(len(MappedStorage.__doc__) >= 1,
+                        "MappedStorage class needs a docstring")
+
+    def test_ms_func_docstrings(self):
+        """Test for the presence of docstrings in MappedStorage methods"""
+        for func in self.ms_f:
+            self.assertIsNot(func[1].__doc__, None,
+                             "{:s} method needs a docstring".format(func[0]))
+            self.assertTrue(len(func[1].__doc__) >= 1,
+                            "{:s} method needs a docstring".format(func[0]))
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing mapped storage")
+class TestMappedStorage(unittest.TestCase):
+    """Test that MappedStorage serves the objects of a binary snapshot"""
+
+    def setUp(self):
+        """Write a binary snapshot and map it"""
+        self.saved = MappedStorage._MappedStorage__file_path
+        self.path = "test_mapped.hbnb"
+        MappedStorage._MappedStorage__file_path = self.path
+        self.states = [State(name="s" + str(i)) for i in range(5)]
+        for i, state in enumerate(self.states):
+            state.created_at = datetime(2024, 1, 1, 0, 0, 5 - i)
+        self.states.reverse()
+        self.city = City(name="Fresno", state_id=self.states[0].id)
+        self.amenity = Amenity(name="wifi")
+        self.place = Place(name="Home", city_id=self.city.id,
+                           amenity_ids=[self.amenity.id])
+        self.write(self.states + [self.city, self.amenity, self.place])
+        self.storage = MappedStorage()
+        self.storage.reload()
+
+    def tearDown(self):
+        """Restore MappedStorage and remove the snapshot"""
+        MappedStorage._MappedStorage__file_path = self.saved
+        MappedStorage._MappedStorage__view = None
+        MappedStorage._MappedStorage__index = {}
+        MappedStorage._MappedStorage__lookups = {}
+        MappedStorage._MappedStorage__synced = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def write(self, objs):
+        """Replace the snapshot by one of objs, as a writer would"""
+        with open(self.path + ".tmp", "w+b") as f:
+            snapshot.write_binary_records(
+                f, [(obj.__class__.__name__ + "." + obj.id, obj.to_dict())
+                    for obj in objs])
+        os.replace(self.path + ".tmp", self.path)
+
+    def test_get(self):
+        """Test that get finds an object by id in the index"""
+        for state in self.states:
+            self.assertEqual(self.storage.get(State, state.id).to_dict(),
+                             state.to_dict())
+        self.assertIsNone(self.storage.get(State, "nope"))
+        self.assertIsNone(self.storage.get(City, self.states[0].id))
+        self.assertIsNone(self.storage.get("Review", "nope"))
+
+    def test_count(self):
+        """Test that counts come from the index"""
+        self.assertEqual(self.storage.count(State), 5)
+        self.assertEqual(self.storage.count("City"), 1)
+        self.assertEqual(self.storage.count(), 8)
+        self.assertEqual(self.storage.counts()["Review"], 0)
+
+    def test_all(self):
+        """Test that all returns the objects of a class by key"""
+        self.assertEqual(set(self.storage.all(State)),
+                         {"State." + state.id for state in self.states})
+        self.assertEqual(len(self.storage.all()), 8)
+
+    def test_page(self):
+        """Test that pages follow (created_at, id) after a cursor"""
+        ids = [state.id for state in self.states]
+        self.assertEqual([s.id for s in self.storage.page(State)], ids)
+        after = (self.states[1].created_at, self.states[1].id)
+        self.assertEqual([s.id for s in self.storage.page(State, after=after,
+                                                          limit=2)],
+                         ids[2:4])
+        where = {"state_id": self.states[0].id}
+        self.assertEqual([c.id for c in self.storage.page(City, where)],
+                         [self.city.id])
+
+    def test_query(self):
+        """Test that queries filter, order and window the records"""
+        ids = [state.id for state in self.states]
+        self.assertEqual([s.id for s in self.storage.query(State, limit=2,
+                                                           offset=1)],
+                         ids[1:3])
+        self.assertEqual([s.id for s in self.storage.query(State,
+                                                           order_by="name")],
+                         ids[::-1])
+        where = {"name": ("in", ["s1", "s3", "x"])}
+        self.assertEqual([s.name for s in self.storage.query(
+            "State", where, order_by="-name")], ["s3", "s1"])
+        where = {"name": (">", "s2")}
+        self.assertEqual(len(self.storage.query(State, where)), 2)
+
+    def test_get_many(self):
+        """Test that the listed objects are found by id, others left out"""
+        ids = [self.states[3].id, "nope", self.states[0].id, "~",
+               self.states[3].id]
+        found = self.storage.get_many(State, ids)
+        self.assertEqual(set(found), {self.states[3].id, self.states[0].id})
+        self.assertEqual(found[self.states[0].id].to_dict(),
+                         self.states[0].to_dict())
+        self.assertEqual(self.storage.get_many("City", ids), {})
+        self.assertEqual(self.storage.get_many("Review", ids), {})
+
+    def test_search_places(self):
+        """Test that places are searched by state and amenity"""
+        found = self.storage.search_places(states=[self.states[0].id])
+        self.assertEqual([place.id for place in found], [self.place.id])
+        found = self.storage.search_places(amenities=[self.amenity.id])
+        self.assertEqual([place.id for place in found], [self.place.id])
+        self.assertEqual(self.storage.amenity_facets([self.place.id]),
+                         {self.amenity.id: 1})
+
+    def test_referencing(self):
+        """Test that records are decoded once per attribute looked up"""
+        decode = snapshot.decode_record
+        with mock.patch.object(snapshot, "decode_record",
+                               side_effect=decode) as decoded:
+            for state in self.states:
+                found = self.storage.referencing(State, "name", state.name)
+                self.assertEqual([s.id for s in found], [state.id])
+            # five to look the states up by name, then one for each hit
+            self.assertEqual(decoded.call_count, 10)
+            found = self.storage.referencing(City, "state_id",
+                                             self.states[0].id)
+            self.assertEqual([c.id for c in found], [self.city.id])
+            self.assertEqual(self.storage.referencing(City, "state_id",
+                                                      "nope"), [])
+            self.assertEqual(self.storage.referencing(City, "state_id",
+                                                      ["nope"]), [])
+        self.assertEqual(self.storage.referencing("Review", "place_id",
+                                                  self.place.id), [])
+        other = City(name="Napa", state_id=self.states[0].id)
+        self.write(self.states + [self.city, other])
+        self.storage.close()
+        found = self.storage.referencing(City, "state_id", self.states[0].id)
+        self.assertEqual({c.id for c in found}, {self.city.id, other.id})
+
+    def test_unlink_amenity_read_only(self):
+        """Test that unlinking a linked amenity answers 503, not 404"""
+        from api.v1.app import app
+        from api.v1.views import places_amenities
+        url = "/api/v1/places/{}/amenities/{}".format(self.place.id,
+                                                      self.amenity.id)
+        with mock.patch.object(models, "storage", self.storage), \
+                mock.patch.object(places_amenities, "storage", self.storage):
+            client = app.test_client()
+            self.assertEqual(client.delete(url).status_code, 503)
+            self.assertEqual(client.post(url).status_code, 200)
+
+    def test_read_only(self):
+        """Test that writes are refused"""
+        with self.assertRaises(io.UnsupportedOperation):
+            self.storage.new(State())
+        with self.assertRaises(io.UnsupportedOperation):
+            self.storage.save()
+
+    def test_close_maps_new_snapshot(self):
+        """Test that close maps the snapshot the writer replaced"""
+        self.write(self.states[:2])
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 2)
+        self.assertIsNone(self.storage.get(City, self.city.id))